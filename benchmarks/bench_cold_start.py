@@ -0,0 +1,113 @@
+"""コールドスタートのベンチマーク
+
+    python benchmarks/bench_cold_start.py [--trials N] [--snapshot front_large.html] [--importtime]
+
+Lambda のコールドスタートを模擬して、毎回新しいPythonプロセスで次の時間を計測する。
+
+    import  send_discord_notification の読み込み時間
+    first   1回目の実行 (キャッシュなし: 取得・解析・通知) の所要時間
+    warm    同じプロセスでの2回目の実行 (304 でキャッシュ済みの解析結果を使う) の所要時間
+
+wiki の代わりに fixtures/ のスナップショットをローカルのHTTPサーバーから配信し、
+通知は tools/fake_discord_webhook.py の代替サーバーに送る。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.join(BENCH_DIR, "..", "lambda")
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "tools"))
+
+from corpus import FixtureServer, load_snapshots  # noqa: E402
+from fake_discord_webhook import FakeWebhookServer  # noqa: E402
+
+# 子プロセスで実行するコード (結果は最後の行にJSONで出力する)
+CHILD = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+import send_discord_notification as bot
+import_ms = (time.perf_counter() - start) * 1000
+bot.WIKI_URL = sys.argv[2]
+timings = []
+for _ in range(2):
+    start = time.perf_counter()
+    bot.lambda_handler({}, None)
+    timings.append((time.perf_counter() - start) * 1000)
+print(json.dumps({"import": import_ms, "first": timings[0], "warm": timings[1]}))
+"""
+
+
+def run_trial(wiki_url, webhook_url):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            AWS_LAMBDA_FUNCTION_NAME="cold-start-bench",
+            WEBHOOK_URL=webhook_url,
+            NOTIFY_MODE="full",
+            FETCH_CACHE_DIR=os.path.join(tmp, "cache"),
+            EVENT_STATE_PATH=os.path.join(tmp, "state.json"),
+            LOG_LEVEL="WARNING",
+            # 実際のウォームスタートは前回の実行から時間が空いているので、リクエスト間隔の待ちは除く
+            HOST_MIN_INTERVAL="0",
+        )
+        env.pop("NOTIFY_CONFIG", None)
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD, LAMBDA_DIR, wiki_url],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_importtime(top):
+    """-X importtime の結果から、読み込みに時間がかかっているモジュールを表示する"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import send_discord_notification"],
+        cwd=LAMBDA_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        rows.append((int(cumulative_us), int(self_us), name))
+    print(f"\n{'module':<40} {'cumulative ms':>14} {'self ms':>9}")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{name.strip():<40} {cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=5, help="プロセスを起動する回数")
+    parser.add_argument("--snapshot", default="front_large.html", help="wiki の代わりに配信するスナップショット")
+    parser.add_argument("--importtime", action="store_true", help="読み込みに時間がかかっているモジュールも表示する")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    load_snapshots([args.snapshot])  # マニフェストと一致するか確認する
+    webhook = FakeWebhookServer(("127.0.0.1", 0), limit=1000, window=1.0, verbose=False)
+    threading.Thread(target=webhook.serve_forever, daemon=True).start()
+    webhook_url = f"http://127.0.0.1:{webhook.server_address[1]}/webhook"
+
+    with FixtureServer() as server:
+        trials = [run_trial(server.url(args.snapshot), webhook_url) for _ in range(args.trials)]
+    webhook.shutdown()
+
+    print(f"{args.snapshot} / {args.trials} 回の中央値")
+    print(f"{'phase':<8} {'median ms':>10} {'min ms':>10} {'max ms':>10}")
+    for phase in ("import", "first", "warm"):
+        values = [trial[phase] for trial in trials]
+        print(f"{phase:<8} {statistics.median(values):>10.1f} {min(values):>10.1f} {max(values):>10.1f}")
+
+    if args.importtime:
+        print_importtime(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""日付範囲抽出のマイクロベンチマーク
+
+    python benchmarks/bench_date_extraction.py [--number N]
+
+リスト項目1件あたりの抽出コストを、旧実装 (5つのパターンを順番に試す方式) と
+date_extractor の単一パターン方式で比較する。
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+
+from date_extractor import find_date_range  # noqa: E402
+
+# 典型的なリスト項目 (日付あり/なし/括弧付きを混ぜる)
+SAMPLE_ITEMS = [
+    "イベント「夏の特別作戦」開催 (2025/05/14 11:00 ～ 05/21 10:59)",
+    "ピックアップ募集：ホシノ（臨戦） 2025/5/14(水) 11:00 ～ 5/21(水) 10:59",
+    "総力戦 ビナー 屋外戦 (2025/05/01 11:00 ～ 05/08 3:59)",
+    "キャンペーン：任務ドロップ量2倍 2025/5/15 ～ 5/30",
+    "メンテナンスのお知らせ：詳細は公式サイトを参照してください",
+    "新規生徒の実装情報はこちらのページにまとめています",
+    "合同火力演習 2025/5/20 ～",
+    "エリドゥ防衛 (2025-05-22 11:00～2025-05-29 3:59) 第3回",
+]
+
+# 旧実装で使っていたパターン (比較用)
+LEGACY_PATTERNS = [
+    r"\d{4}[/-]\d{1,2}[/-]\d{1,2}.*?\d{1,2}:\d{2}.*?[～~].*?\d{1,2}[/-]\d{1,2}.*?\d{1,2}:\d{2}",
+    r"\d{4}[/-]\d{1,2}[/-]\d{1,2}.*?[～~].*?\d{1,2}[/-]\d{1,2}",
+    r"\d{4}[/-]\d{1,2}[/-]\d{1,2}.*?[～~].*?",
+    r"[～~].*?\d{4}[/-]\d{1,2}[/-]\d{1,2}",
+    r"\(\d{4}[/-]\d{1,2}[/-]\d{1,2}.*?\d{1,2}:\d{2}.*?[～~].*?\d{1,2}[/-]\d{1,2}.*?\d{1,2}:\d{2}\)",
+]
+
+
+def legacy_extract(text):
+    """旧実装の検索と日付パースを再現したもの"""
+    date_text = None
+    if "(" in text and ")" in text:
+        for bracket_text in re.findall(r'\((.*?)\)', text):
+            if "～" in bracket_text or "~" in bracket_text:
+                if any(re.search(p, "(" + bracket_text + ")") for p in LEGACY_PATTERNS):
+                    date_text = bracket_text
+                    break
+    if date_text is None:
+        for pattern in LEGACY_PATTERNS:
+            match = re.search(pattern, text)
+            if match:
+                date_text = match.group(0).strip("()")
+                break
+    if date_text is None:
+        return None
+    parts = re.split(r"[～~]", date_text, maxsplit=1)
+    start = re.search(r"(\d{4})[/-](\d{1,2})[/-](\d{1,2})", parts[0])
+    re.search(r"(\d{1,2}):(\d{2})", parts[0])
+    if len(parts) > 1:
+        re.search(r"(?:(\d{4})[/-])?(\d{1,2})[/-](\d{1,2})", parts[1])
+        re.search(r"(\d{1,2}):(\d{2})", parts[1])
+    return start
+
+
+def run_all(extract):
+    for text in SAMPLE_ITEMS:
+        extract(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000, help="計測の繰り返し回数")
+    args = parser.parse_args()
+
+    for label, extract in [("legacy", legacy_extract), ("date_extractor", find_date_range)]:
+        best = min(timeit.repeat(lambda: run_all(extract), number=args.number, repeat=5))
+        per_item = best / (args.number * len(SAMPLE_ITEMS)) * 1e6
+        print(f"{label:>15}: {per_item:8.2f} µs/item")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""wiki のページを取得してベンチマーク用のスナップショットに追加する
+
+    python benchmarks/capture_snapshot.py [URL] [--name NAME]
+"""
+import argparse
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from corpus import FIXTURES_DIR, load_manifest, save_manifest
+
+JST = timezone(timedelta(hours=9))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("url", nargs="?", default="https://bluearchive.wikiru.jp/")
+    parser.add_argument("--name", help="保存するファイル名 (デフォルト: front_<取得日時>.html)")
+    args = parser.parse_args()
+
+    captured_at = datetime.now(JST)
+    name = args.name or f"front_{captured_at.strftime('%Y%m%d_%H%M')}.html"
+
+    response = requests.get(args.url, timeout=30)
+    response.raise_for_status()
+    response.encoding = "utf-8"
+    data = response.text.encode("utf-8")
+
+    with open(os.path.join(FIXTURES_DIR, name), "wb") as f:
+        f.write(data)
+
+    manifest = load_manifest()
+    manifest["snapshots"] = [entry for entry in manifest["snapshots"] if entry["file"] != name]
+    manifest["snapshots"].append({
+        "file": name,
+        "captured_at": captured_at.isoformat(timespec="seconds"),
+        "source": args.url,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "description": "",
+    })
+    save_manifest(manifest)
+    print(f"{name} を保存しました ({len(data)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""ベンチマーク用スナップショットの読み込みとローカル配信"""
+import hashlib
+import json
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MANIFEST_PATH = os.path.join(FIXTURES_DIR, "manifest.json")
+
+
+def load_manifest():
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def load_snapshots(names=None):
+    """(ファイル名, HTML) のリストを返す。内容がマニフェストと一致しなければ例外を送出する"""
+    snapshots = []
+    for entry in load_manifest()["snapshots"]:
+        if names and entry["file"] not in names:
+            continue
+        with open(os.path.join(FIXTURES_DIR, entry["file"]), "rb") as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+            raise Exception(f"スナップショットが変更されています: {entry['file']} (マニフェストを更新してください)")
+        snapshots.append((entry["file"], data.decode("utf-8")))
+    return snapshots
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """fixtures ディレクトリをローカルのHTTPで配信する (wiki の代わり)"""
+
+    def __init__(self, directory=FIXTURES_DIR):
+        handler = partial(_QuietHandler, directory=directory)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/{name}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
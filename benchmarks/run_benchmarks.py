@@ -0,0 +1,232 @@
+"""スクレイパーのオフラインベンチマーク
+
+    python benchmarks/run_benchmarks.py                    # 計測して結果を表示
+    python benchmarks/run_benchmarks.py --check            # ベースラインと比較し、遅くなっていれば終了コード1
+    python benchmarks/run_benchmarks.py --update-baseline  # 現在の結果をベースラインとして保存
+
+fixtures/ のスナップショットごとに、次の段階を個別に計測する。
+
+    parse     HTMLの解析とリスト項目のテキスト抽出 (通信なし)
+    extract   日付範囲の抽出
+    cleanup   イベント名の整形
+    format    日付の整形とWebhookメッセージの組み立て
+    pipeline  ローカルHTTPサーバーから取得して開催中のイベントを選ぶまで
+    cached    pipeline と同じ処理を、整形結果のキャッシュが温まった状態で行う (ウォームスタート)
+
+format と pipeline は、整形結果のキャッシュ (イベント名・日付) を毎回空にしてから計測する。
+
+各段階の実行時間 (中央値)、tracemalloc によるメモリ割り当てのピーク、
+段階終了時点のプロセスの最大RSSを表示する。
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+
+import send_discord_notification as bot  # noqa: E402
+from corpus import FixtureServer, load_snapshots  # noqa: E402
+from discord_delivery import build_payloads  # noqa: E402
+from event_model import JST  # noqa: E402
+from fetch_cache import CacheBackend, FetchCache  # noqa: E402
+from host_pool import HostPool  # noqa: E402
+import html_backend  # noqa: E402
+from html_backend import parse_html, resolve_backend  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# ベンチマークで使う「現在日時」(スナップショットの取得日に合わせて固定する)
+BENCH_NOW = datetime(2026, 10, 18, 12, 0, tzinfo=JST)
+
+# ベースラインとの比較で、この差 (ミリ秒) 以下の変化はノイズとして無視する
+NOISE_FLOOR_MS = 0.5
+
+
+class MemoryCacheBackend(CacheBackend):
+    """ベンチマーク用のメモリ上のキャッシュ"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def load(self, key):
+        return self.entries.get(key)
+
+    def save(self, key, entry):
+        self.entries[key] = entry
+
+
+def clear_render_caches():
+    """イベント名と日付の整形結果のキャッシュを空にする"""
+    bot.event_names.clear()
+    bot.fallback_names.clear()
+    bot.formatted_dates.clear()
+
+
+def make_stages(name, html, server):
+    """スナップショット1件分の段階ごとの計測関数を作る"""
+    # ローカルのサーバーに繰り返しリクエストするので、ホストごとのリクエスト間隔は空けない
+    bot.hosts = HostPool(min_interval=0)
+
+    # 本番と同じく、対象領域で候補が見つからなければページ全体を解析する
+    section_ids = bot.EVENT_SECTION_IDS or None
+    if section_ids:
+        parsed = bot.extract_events(parse_html(html, section_ids=section_ids))
+        if not (parsed["items"] or parsed["fallback"]):
+            section_ids = None
+
+    document = parse_html(html, section_ids=section_ids)
+    li_texts = [text for text in document.iter_texts("li") if len(text) >= 10]
+    matched = [(text, bot.find_date_range(text)) for text in li_texts]
+    matched = [(text, date_range) for text, date_range in matched if date_range is not None]
+    names = [(bot.clean_event_name(text), date_range) for text, date_range in matched]
+
+    def parse():
+        doc = parse_html(html, section_ids=section_ids)
+        for _ in doc.iter_blocks(("li", "ul")):
+            pass
+
+    def extract():
+        for text in li_texts:
+            bot.find_date_range(text)
+
+    def cleanup():
+        for text, _ in matched:
+            bot.clean_event_name(text)
+
+    def format_messages():
+        clear_render_caches()
+        candidates = [bot.make_candidate(event_name, date_range) for event_name, date_range in names]
+        build_payloads("📢 開催中のイベント情報: ", [candidate["formatted"] for candidate in candidates])
+
+    def pipeline():
+        clear_render_caches()
+        cached()
+
+    def cached():
+        bot.WIKI_URL = server.url(name)
+        bot.fetch_cache = FetchCache(MemoryCacheBackend(), parser_version=bot.PARSER_VERSION)
+        bot.fetch_current_events(BENCH_NOW)
+
+    return [
+        ("parse", parse),
+        ("extract", extract),
+        ("cleanup", cleanup),
+        ("format", format_messages),
+        ("pipeline", pipeline),
+        ("cached", cached),
+    ]
+
+
+def measure(func, repeat):
+    """(実行時間の中央値 ms, 割り当てのピーク KiB, 最大RSS KiB) を返す"""
+    func()  # ウォームアップ
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return statistics.median(timings), peak / 1024, max_rss
+
+
+def run(repeat, names=None):
+    results = {}
+    with FixtureServer() as server:
+        for name, html in load_snapshots(names):
+            results[name] = {}
+            for stage, func in make_stages(name, html, server):
+                median_ms, peak_kib, max_rss = measure(func, repeat)
+                results[name][stage] = {
+                    "median_ms": round(median_ms, 3),
+                    "peak_kib": round(peak_kib, 1),
+                    "max_rss_kib": max_rss,
+                }
+    return results
+
+
+def print_results(results, baseline=None):
+    print(f"{'snapshot':<22} {'stage':<9} {'median ms':>10} {'baseline':>10} {'alloc KiB':>10} {'max RSS KiB':>12}")
+    for name, stages in results.items():
+        for stage, result in stages.items():
+            base = (baseline or {}).get(name, {}).get(stage)
+            base_ms = f"{base['median_ms']:.3f}" if base else "-"
+            print(f"{name:<22} {stage:<9} {result['median_ms']:>10.3f} {base_ms:>10} "
+                  f"{result['peak_kib']:>10.1f} {result['max_rss_kib']:>12}")
+
+
+def find_regressions(results, baseline, tolerance):
+    """ベースラインより tolerance 以上遅くなった (スナップショット, 段階) を返す"""
+    regressions = []
+    for name, stages in results.items():
+        for stage, result in stages.items():
+            base = baseline.get(name, {}).get(stage)
+            if not base:
+                continue
+            limit = max(base["median_ms"] * (1 + tolerance), base["median_ms"] + NOISE_FLOOR_MS)
+            if result["median_ms"] > limit:
+                regressions.append((name, stage, base["median_ms"], result["median_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="段階ごとの計測回数")
+    parser.add_argument("--snapshot", action="append", help="計測するスナップショット (複数指定可)")
+    parser.add_argument("--check", action="store_true", help="ベースラインより遅くなっていれば失敗にする")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="許容する遅延の割合 (デフォルト: 0.5 = 50%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="結果をベースラインとして保存する")
+    parser.add_argument("--backend", default=html_backend.HTML_BACKEND, help="HTMLパーサー (auto / selectolax / lxml / html.parser)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    html_backend.HTML_BACKEND = backend = resolve_backend(args.backend)
+    print(f"HTMLパーサー: {backend}")
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        # ベースラインは計測したパーサーごとに保存している
+        baseline = saved.get(backend, {})
+
+    results = run(args.repeat, args.snapshot)
+    print_results(results, baseline)
+
+    if args.update_baseline:
+        saved = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        saved[backend] = results
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"ベースラインを更新しました: {BASELINE_PATH}")
+
+    if args.check:
+        if not baseline:
+            print(f"{backend} のベースラインがありません。--update-baseline で作成してください。")
+            sys.exit(1)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for name, stage, base_ms, median_ms in regressions:
+            print(f"遅くなっています: {name} / {stage}: {base_ms:.3f} ms -> {median_ms:.3f} ms")
+        if regressions:
+            sys.exit(1)
+        print("ベースラインからの劣化はありません。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# 抽出結果 (start/end は日本時間を表すタイムゾーンなしの datetime、text は元の日付テキスト、span はテキスト内の位置、
+# start_clock/end_clock は元のテキストに書かれていた時刻 ("4:00" など、書かれていなければ None))
+DateRange = namedtuple("DateRange", ["start", "end", "text", "span", "bracketed", "start_clock", "end_clock"])
+
+# 区切り文字の間に許す余計な文字数 (曜日表記 "(水)" や空白など)
+_FILLER = r"[^\d～~]{0,12}?"
+
+# 日付範囲のパターン (モジュール読み込み時に一度だけコンパイルする)
+#   2025/5/14 11:00 ～ 5/21 3:59
+#   2025/5/14(水) 11:00 ～ 2025/5/21(水) 10:59
+#   2025/5/14 ～ 5/21
+#   2025/5/14 ～ （終了日不明）
+DATE_RANGE_RE = re.compile(
+    rf"""
+    (?P<range>
+        (?P<sy>\d{{4}})[/-](?P<smo>\d{{1,2}})[/-](?P<sd>\d{{1,2}})
+        (?:{_FILLER}(?P<sh>\d{{1,2}}):(?P<smi>\d{{2}}))?
+        {_FILLER}
+        [～~]
+        (?:
+            {_FILLER}
+            (?:(?P<ey>\d{{4}})[/-])?(?P<emo>\d{{1,2}})[/-](?P<ed>\d{{1,2}})
+            (?:{_FILLER}(?P<eh>\d{{1,2}}):(?P<emi>\d{{2}}))?
+        )?
+    )
+    """,
+    re.VERBOSE,
+)
+
+# 終了日がない場合の開催期間
+DEFAULT_DURATION = timedelta(days=30)
+
+
+def _is_bracketed(text, index):
+    """index の直前 (空白を除く) が開き括弧かどうか"""
+    index -= 1
+    while index >= 0 and text[index] in " 　":
+        index -= 1
+    return index >= 0 and text[index] in "(（"
+
+
+def _to_date_range(text, match):
+    """マッチ結果を DateRange に変換する (不正な日付の場合は None)"""
+    g = match.groupdict()
+    try:
+        start = datetime(
+            int(g["sy"]), int(g["smo"]), int(g["sd"]),
+            int(g["sh"] or 0), int(g["smi"] or 0),
+        )
+        if g["emo"]:
+            # 終了日に年が含まれていない場合は開始日の年を使用、時間がなければ23:59
+            end = datetime(
+                int(g["ey"] or g["sy"]), int(g["emo"]), int(g["ed"]),
+                int(g["eh"] or 23), int(g["emi"] or 59),
+            )
+            if not g["ey"] and end < start:
+                # 年をまたぐ期間 (12/25 ～ 1/5) は終了日を翌年にする
+                end = end.replace(year=end.year + 1)
+        else:
+            # 終了日が見つからない場合は1ヶ月後に設定
+            end = start + DEFAULT_DURATION
+    except ValueError:
+        return None
+    span = match.span("range")
+    return DateRange(
+        start, end, match.group("range"), span, _is_bracketed(text, span[0]),
+        f"{g['sh']}:{g['smi']}" if g["sh"] else None,
+        f"{g['eh']}:{g['emi']}" if g["eh"] else None,
+    )
+
+
+def iter_date_ranges(text):
+    """テキスト中の日付範囲を先頭から順に返す"""
+    for match in DATE_RANGE_RE.finditer(text):
+        date_range = _to_date_range(text, match)
+        if date_range is not None:
+            yield date_range
+
+
+def find_date_range(text):
+    """テキストを代表する日付範囲を1つ選ぶ (括弧付きのものを優先)"""
+    first = None
+    for date_range in iter_date_ranges(text):
+        if date_range.bracketed:
+            return date_range
+        if first is None:
+            first = date_range
+    return first
+
+
+def strip_date_ranges(text):
+    """テキストから日付範囲をすべて除去する (イベント名の抽出用)"""
+    return DATE_RANGE_RE.sub("", text)
@@ -0,0 +1,53 @@
+import math
+import time
+
+
+class DeadlineExceeded(Exception):
+    """実行時間の予算を使い切った"""
+
+
+class Deadline:
+    """Lambda の残り実行時間をもとにした締め切り。
+
+    seconds が None の場合は締め切りなし (GitHub Actions やローカル実行)。
+    """
+
+    def __init__(self, seconds=None, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = None if seconds is None else clock() + seconds
+
+    @classmethod
+    def from_context(cls, context, safety_margin=1.0):
+        """Lambda の context から作る (ログ出力と後片付けの分だけ余裕を持たせる)"""
+        if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+            return cls()
+        return cls(context.get_remaining_time_in_millis() / 1000 - safety_margin)
+
+    def remaining(self):
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def reserve(self, seconds):
+        """後の段階のために seconds を残した、この段階用の締め切りを返す"""
+        child = Deadline(clock=self.clock)
+        if self.expires_at is not None:
+            child.expires_at = self.expires_at - seconds
+        return child
+
+    def timeout(self, limit):
+        """HTTPリクエストなどに渡すタイムアウト (limit と残り時間の短い方)"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("実行時間の予算を使い切りました。")
+        return min(limit, remaining)
+
+    def sleep(self, seconds, sleep=time.sleep):
+        """締め切りを越えない範囲で待つ (待ちきれない場合は例外を送出する)"""
+        if seconds > self.remaining():
+            raise DeadlineExceeded(f"{seconds:.2f} 秒待つと実行時間の予算を超えます。")
+        if seconds > 0:
+            sleep(seconds)
@@ -0,0 +1,215 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Discordの制限値
+CONTENT_LIMIT = 2000  # content の最大文字数
+EMBED_DESCRIPTION_LIMIT = 4096  # embed.description の最大文字数
+EMBED_TOTAL_LIMIT = 6000  # 1メッセージ内の embed 合計文字数
+EMBEDS_PER_MESSAGE = 10  # 1メッセージに載せられる embed 数
+
+# 送信成功とみなすステータスコード (?wait=true の場合は 200 が返る)
+SUCCESS_STATUS = (200, 204)
+
+
+def _split_long_line(line, limit):
+    """limit を超える1行を limit 文字ずつに分割する"""
+    return [line[i:i + limit] for i in range(0, len(line), limit)] or [""]
+
+
+class PayloadBuilder:
+    """行を1行ずつ受け取り、できるだけ少ないWebhookメッセージに詰めていく。
+
+    行は改行区切りで embed の description (4096文字まで) にまとめ、1メッセージあたり
+    最大10個の embed (合計6000文字まで) を載せる。ヘッダーは最初のメッセージの content に入れる。
+    """
+
+    def __init__(self, header):
+        self.header = header[:CONTENT_LIMIT]
+        self.payloads = []
+        self.embeds = []
+        self.total = 0  # embeds の合計文字数
+        self.block = []  # 組み立て中の description の行
+        self.size = 0  # block を改行で連結したときの文字数
+
+    def add(self, line):
+        for part in _split_long_line(line, EMBED_DESCRIPTION_LIMIT):
+            added = len(part) + (1 if self.block else 0)
+            if self.block and self.size + added > EMBED_DESCRIPTION_LIMIT:
+                self._flush_block()
+                added = len(part)
+            self.block.append(part)
+            self.size += added
+
+    def _flush_block(self):
+        block = "\n".join(self.block)
+        self.block = []
+        self.size = 0
+        if self.embeds and (len(self.embeds) >= EMBEDS_PER_MESSAGE or self.total + len(block) > EMBED_TOTAL_LIMIT):
+            self.payloads.append({"embeds": self.embeds})
+            self.embeds = []
+            self.total = 0
+        self.embeds.append({"description": block})
+        self.total += len(block)
+
+    def build(self):
+        """組み立てたメッセージのリストを返す (行がなければヘッダーだけのメッセージ1件)"""
+        if self.block:
+            self._flush_block()
+        if not self.embeds:
+            return [{"content": self.header}]
+        payloads = self.payloads + [{"embeds": self.embeds}]
+        payloads[0]["content"] = self.header
+        return payloads
+
+
+def build_payloads(header, lines):
+    """ヘッダーと行 (リストやジェネレーター) を、できるだけ少ないWebhookメッセージに詰める"""
+    builder = PayloadBuilder(header)
+    for line in lines:
+        builder.add(line)
+    return builder.build()
+
+
+class RateLimiter:
+    """X-RateLimit-* ヘッダーに基づいてルートごとのバケットを管理する"""
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.route_buckets = {}  # ルート -> バケットID
+        self.buckets = {}  # バケットID -> (残り回数, リセット時刻)
+        self.global_reset_at = 0.0
+
+    def _bucket_key(self, route):
+        return self.route_buckets.get(route, route)
+
+    def wait(self, route, deadline=None):
+        """送信可能になるまで待つ (締め切りまでに間に合わない場合は DeadlineExceeded)"""
+        with self.lock:
+            now = self.clock()
+            delay = max(0.0, self.global_reset_at - now)
+            remaining, reset_at = self.buckets.get(self._bucket_key(route), (1, 0.0))
+            if remaining <= 0:
+                delay = max(delay, reset_at - now)
+        if delay > 0:
+            logger.info(f"レート制限のため {delay:.2f} 秒待機します。")
+            (deadline or Deadline()).sleep(delay, self.sleep)
+
+    def update(self, route, response):
+        """レスポンスヘッダーからバケットの状態を更新する"""
+        headers = response.headers
+        bucket = headers.get("X-RateLimit-Bucket")
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        with self.lock:
+            if bucket:
+                self.route_buckets[route] = bucket
+            if remaining is not None and reset_after is not None:
+                try:
+                    self.buckets[self._bucket_key(route)] = (
+                        int(remaining), self.clock() + float(reset_after)
+                    )
+                except ValueError:
+                    pass
+
+    def limited(self, route, retry_after, is_global):
+        """429 を受け取ったときに待ち時間を登録する"""
+        with self.lock:
+            reset_at = self.clock() + retry_after
+            if is_global:
+                self.global_reset_at = max(self.global_reset_at, reset_at)
+            else:
+                self.buckets[self._bucket_key(route)] = (0, reset_at)
+
+
+def _retry_after(response):
+    """429 レスポンスから待ち時間 (秒) を取得する"""
+    try:
+        return float(response.json()["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        pass
+    try:
+        return float(response.headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
+
+class DiscordWebhookClient:
+    """セッションを使い回し、レート制限とリトライに対応したWebhook送信クライアント"""
+
+    def __init__(self, session=None, max_attempts=5, timeout=10,
+                 backoff_base=0.5, backoff_max=8.0, rate_limiter=None, sleep=time.sleep):
+        self.session = session or requests.Session()
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter or RateLimiter(sleep=sleep)
+        self.sleep = sleep
+
+    def _backoff(self, attempt):
+        """ジッター付き指数バックオフ (full jitter)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def send(self, url, payload, deadline=None):
+        """1メッセージを送信する。失敗が続いた場合は例外を送出する"""
+        deadline = deadline or Deadline()
+        last_error = None
+        for attempt in range(self.max_attempts):
+            self.rate_limiter.wait(url, deadline)
+            try:
+                response = self.session.post(url, json=payload, timeout=deadline.timeout(self.timeout))
+            except requests.RequestException as e:
+                last_error = f"リクエストエラー: {e}"
+                logger.warning(f"Webhook送信中にエラーが発生しました ({attempt + 1}/{self.max_attempts}): {e}")
+                deadline.sleep(min(self._backoff(attempt), deadline.remaining()), self.sleep)
+                continue
+
+            self.rate_limiter.update(url, response)
+
+            if response.status_code in SUCCESS_STATUS:
+                return response
+
+            if response.status_code == 429:
+                retry_after = _retry_after(response)
+                is_global = response.headers.get("X-RateLimit-Global", "").lower() == "true"
+                logger.warning(f"レート制限されました。{retry_after:.2f} 秒後に再送します。")
+                self.rate_limiter.limited(url, retry_after, is_global)
+                last_error = "ステータスコード: 429"
+                continue
+
+            last_error = f"ステータスコード: {response.status_code}, レスポンス: {response.text}"
+            if response.status_code < 500:
+                # 4xx はリトライしても成功しないのでそのまま失敗とする
+                break
+            logger.warning(f"Webhookがエラーを返しました ({attempt + 1}/{self.max_attempts}): {last_error}")
+            deadline.sleep(min(self._backoff(attempt), deadline.remaining()), self.sleep)
+
+        logger.error(f"通知に失敗しました。{last_error}")
+        raise Exception(f"通知に失敗しました。{last_error}")
+
+    def deliver(self, url, payloads, deadline=None):
+        """複数メッセージを順番に送信する"""
+        for index, payload in enumerate(payloads, 1):
+            self.send(url, payload, deadline)
+            logger.info(f"メッセージを送信しました ({index}/{len(payloads)})")
+
+
+# ウォームスタート間で使い回すクライアント (HTTPコネクションをプールする)
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = DiscordWebhookClient()
+    return _client
@@ -0,0 +1,213 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+
+# wiki に載っている日時は日本時間
+JST = timezone(timedelta(hours=9), "JST")
+
+
+def parse_time(value):
+    """ISO形式の文字列を日本時間の datetime にする (タイムゾーンがなければJSTとみなす)"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=JST)
+    # fromisoformat は毎回別の timezone オブジェクトを作る。tzinfo が異なる datetime
+    # 同士の比較は遅いので、すべて同じ JST オブジェクトに揃えておく
+    return parsed.astimezone(JST)
+
+
+def now_jst():
+    return datetime.now(JST)
+
+
+class Event:
+    """解析済みのイベント1件"""
+
+    __slots__ = ("name", "start", "end", "formatted", "order")
+
+    def __init__(self, name, start, end, formatted, order=0):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.formatted = formatted
+        self.order = order  # ページ上での出現順
+
+    @classmethod
+    def from_candidate(cls, candidate, order=0):
+        """解析結果 (キャッシュ可能な辞書) から作る"""
+        return cls(
+            candidate["name"],
+            parse_time(candidate["start"]),
+            parse_time(candidate["end"]),
+            candidate["formatted"],
+            order,
+        )
+
+    def is_active(self, at):
+        return self.start <= at <= self.end
+
+    def __repr__(self):
+        return f"Event({self.name!r}, {self.start.isoformat()} ~ {self.end.isoformat()})"
+
+
+class _IntervalNode:
+    """中心点で区間を分割する区間木のノード"""
+
+    __slots__ = ("center", "by_start", "starts", "by_end", "ends", "left", "right")
+
+    def __init__(self, events):
+        points = sorted([event.start for event in events] + [event.end for event in events])
+        self.center = points[len(points) // 2]
+
+        left, right, here = [], [], []
+        for event in events:
+            if event.end < self.center:
+                left.append(event)
+            elif event.start > self.center:
+                right.append(event)
+            else:
+                here.append(event)
+        # 中心点はいずれかの区間の端点なので、start <= end の区間だけなら here は空にならず、
+        # 子ノードの区間は必ずこのノードより少なくなる (EventIndex で逆転した区間を除いている)
+
+        # 中心点をまたぐ区間を開始順・終了順 (降順) で持つ
+        self.by_start = sorted(here, key=lambda event: event.start)
+        self.starts = [event.start for event in self.by_start]
+        self.by_end = sorted(here, key=lambda event: event.end, reverse=True)
+        self.ends = [-event.end.timestamp() for event in self.by_end]
+        self.left = _IntervalNode(left) if left else None
+        self.right = _IntervalNode(right) if right else None
+
+    def stab(self, at, result):
+        node = self
+        while node is not None:
+            if at < node.center:
+                # 開始が at 以前のものだけが at を含む
+                result.extend(node.by_start[:bisect_right(node.starts, at)])
+                node = node.left
+            elif at > node.center:
+                # 終了が at 以降のものだけが at を含む
+                result.extend(node.by_end[:bisect_right(node.ends, -at.timestamp())])
+                node = node.right
+            else:
+                result.extend(node.by_start)
+                node = None
+
+
+class EventIndex:
+    """イベントの区間インデックス。
+
+    1回の解析結果に対して、任意の時刻での「開催中」「N時間以内に開始」
+    「N時間以内に終了」を O(log n + 件数) で問い合わせられる。
+    """
+
+    def __init__(self, events):
+        # 終了が開始より前の区間はどの時刻でも開催中にならない。区間木に入れると
+        # 分割できずに同じ集合で再帰し続けるので除いておく
+        self.events = [event for event in events if event.start <= event.end]
+        self.tree = _IntervalNode(self.events) if self.events else None
+        self.by_start = sorted(self.events, key=lambda event: event.start)
+        self.starts = [event.start for event in self.by_start]
+        self.by_end = sorted(self.events, key=lambda event: event.end)
+        self.ends = [event.end for event in self.by_end]
+
+    def __len__(self):
+        return len(self.events)
+
+    def active_at(self, at):
+        """at の時点で開催中のイベント (ページ上の順)"""
+        result = []
+        if self.tree is not None:
+            self.tree.stab(at, result)
+        return sorted(result, key=lambda event: event.order)
+
+    def starting_within(self, at, hours):
+        """at より後、hours 時間以内に開始するイベント"""
+        low = bisect_right(self.starts, at)
+        high = bisect_right(self.starts, at + timedelta(hours=hours))
+        return self.by_start[low:high]
+
+    def ending_within(self, at, hours):
+        """at の時点で開催中で、hours 時間以内に終了するイベント"""
+        low = bisect_left(self.ends, at)
+        high = bisect_right(self.ends, at + timedelta(hours=hours))
+        return [event for event in self.by_end[low:high] if event.start <= at]
+
+
+def _unique(events):
+    """表示内容が同じイベントを除く (先に出てきたものを残す)"""
+    seen = set()
+    result = []
+    for event in events:
+        if event.formatted not in seen:
+            seen.add(event.formatted)
+            result.append(event)
+    return result
+
+
+class EventSchedule:
+    """1回の解析結果 (リスト項目とフォールバック候補) に対する問い合わせ"""
+
+    def __init__(self, items, fallback=()):
+        self.items = EventIndex(items)
+        self._fallback_events = fallback
+        self._fallback = None
+
+    @classmethod
+    def from_parsed(cls, parsed):
+        items = [Event.from_candidate(candidate, order) for order, candidate in enumerate(parsed["items"])]
+        # フォールバック候補は使うときまで Event にしない
+        fallback = parsed["fallback"]
+        return cls(items, lambda: [Event.from_candidate(candidate, order) for order, candidate in enumerate(fallback)])
+
+    @property
+    def fallback(self):
+        """フォールバック候補のインデックス (リスト項目で足りない場合にだけ作る)"""
+        if self._fallback is None:
+            events = self._fallback_events
+            self._fallback = EventIndex(events() if callable(events) else events)
+        return self._fallback
+
+    def events(self):
+        """すべてのイベント (リスト項目から見つからなければフォールバック候補、ページ上の順)"""
+        return _unique(self.items.events or self.fallback.events)
+
+    def _index_for(self, at):
+        # リスト項目から開催中のイベントが見つからない場合だけフォールバック候補を使う
+        if not self.items.active_at(at) and self.fallback.active_at(at):
+            return self.fallback
+        return self.items
+
+    def active_at(self, at):
+        active = self.items.active_at(at) or self.fallback.active_at(at)
+        return _unique(active)
+
+    def starting_within(self, at, hours):
+        return _unique(self._index_for(at).starting_within(at, hours))
+
+    def ending_within(self, at, hours):
+        return _unique(self._index_for(at).ending_within(at, hours))
+
+
+class ScheduleGroup:
+    """複数の取得元の EventSchedule をまとめて問い合わせる (通知先ごとの絞り込み付き)"""
+
+    def __init__(self, schedules, predicate=None):
+        self.schedules = list(schedules)
+        self.predicate = predicate
+
+    def _collect(self, method, at, *args):
+        events = []
+        for schedule in self.schedules:
+            events.extend(getattr(schedule, method)(at, *args))
+        if self.predicate is not None:
+            events = [event for event in events if self.predicate(event)]
+        return _unique(events)
+
+    def active_at(self, at):
+        return self._collect("active_at", at)
+
+    def starting_within(self, at, hours):
+        return self._collect("starting_within", at, hours)
+
+    def ending_within(self, at, hours):
+        return self._collect("ending_within", at, hours)
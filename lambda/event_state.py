@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import re
+import unicodedata
+from collections import Counter
+from datetime import timedelta
+
+from event_model import parse_time
+
+logger = logging.getLogger(__name__)
+
+# 状態の保存先 (S3 のURIが指定されていればそちらを優先する)
+EVENT_STATE_PATH = os.environ.get("EVENT_STATE_PATH", "/tmp/wiki_reminder_state.json")
+EVENT_STATE_S3_URI = os.environ.get("EVENT_STATE_S3_URI", "")
+
+# 終了何時間前から「まもなく終了」として通知するか
+ENDING_SOON_HOURS = int(os.environ.get("ENDING_SOON_HOURS", "24"))
+
+# 終了してからこの期間が過ぎたイベントは状態から削除する
+RETENTION = timedelta(days=7)
+
+STATE_VERSION = 1
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_name(name):
+    """表記ゆれ (全角/半角、大文字/小文字、空白) を吸収したイベント名"""
+    name = unicodedata.normalize("NFKC", name).lower()
+    return _WHITESPACE_RE.sub(" ", name).strip()
+
+
+def event_key(event):
+    """イベントを識別する安定したキー (正規化したイベント名 + 開始日)"""
+    return f"{normalize_name(event.name)}|{event.start.date().isoformat()}"
+
+
+def event_keys(events):
+    """同じ時点のイベントそれぞれのキー (events と同じ順のリスト)。
+
+    名前と開始日が同じイベントが複数ある場合は、終了日時 (それも同じなら表示内容) を
+    キーに加えて区別する。
+    """
+    keys = [event_key(event) for event in events]
+    for extra in (lambda event: event.end.isoformat(), lambda event: event.formatted):
+        counts = Counter(keys)
+        keys = [f"{key}|{extra(event)}" if counts[key] > 1 else key for key, event in zip(keys, events)]
+    return keys
+
+
+def _identity(event):
+    return event.name, event.start, event.end, event.formatted
+
+
+class StateBackend:
+    """状態の保存先のインターフェース"""
+
+    def load(self):
+        raise NotImplementedError
+
+    def save(self, state):
+        raise NotImplementedError
+
+
+class JsonFileStateBackend(StateBackend):
+    """ローカルのJSONファイルに保存するバックエンド"""
+
+    def __init__(self, path=EVENT_STATE_PATH):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"イベント状態の読み込みに失敗しました: {e}")
+            return None
+
+    def save(self, state):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class S3StateBackend(StateBackend):
+    """S3 のオブジェクトに保存するバックエンド (コールドスタートをまたいで状態を保持できる)"""
+
+    def __init__(self, uri=EVENT_STATE_S3_URI, client=None):
+        if not uri.startswith("s3://"):
+            raise ValueError(f"S3 のURIではありません: {uri}")
+        self.bucket, _, self.key = uri[len("s3://"):].partition("/")
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("s3")
+        return self._client
+
+    def load(self):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response["Body"].read())
+
+    def save(self, state):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Body=json.dumps(state, ensure_ascii=False).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+
+def _with_suffix(location, name):
+    """通知先ごとの保存先 (既定の通知先は従来どおりの場所)"""
+    if not name or name == "default":
+        return location
+    root, ext = os.path.splitext(location)
+    return f"{root}.{name}{ext}"
+
+
+def default_backend(name=None):
+    """状態の保存先 (name は通知先の名前。通知先ごとに別の場所に保存する)"""
+    if EVENT_STATE_S3_URI:
+        return S3StateBackend(_with_suffix(EVENT_STATE_S3_URI, name))
+    return JsonFileStateBackend(_with_suffix(EVENT_STATE_PATH, name))
+
+
+class EventDiff:
+    """前回からの差分"""
+
+    def __init__(self, new=None, changed=None, ending_soon=None):
+        self.new = new or []
+        self.changed = changed or []
+        self.ending_soon = ending_soon or []
+
+    def __bool__(self):
+        return bool(self.new or self.changed or self.ending_soon)
+
+    def lines(self):
+        """通知用の行 (種類ごとに見出し記号を付ける)"""
+        return (
+            [f"🆕 {event.formatted}" for event in self.new]
+            + [f"🔄 {event.formatted}" for event in self.changed]
+            + [f"⏰ {event.formatted}" for event in self.ending_soon]
+        )
+
+
+class EventStateStore:
+    """通知済みのイベントを記録し、実行ごとの差分を計算する"""
+
+    def __init__(self, backend=None, ending_soon_hours=ENDING_SOON_HOURS):
+        self.backend = backend or default_backend()
+        self.ending_soon_hours = ending_soon_hours
+        self.ending_soon = timedelta(hours=ending_soon_hours)
+        self.events = {}
+        self.loaded = False
+
+    def load(self):
+        state = self.backend.load()
+        if state and state.get("version") == STATE_VERSION:
+            self.events = state.get("events", {})
+        else:
+            self.events = {}
+        self.loaded = True
+        logger.info(f"イベント状態を読み込みました ({len(self.events)}件)")
+
+    def _record_for(self, event, key):
+        """イベントの記録を返す (なければ None)"""
+        # 同名・同日のイベントが増減するとキーが変わるので、以前のキーの記録も終了日時で照合する
+        base = event_key(event)
+        for candidate in (key, base, f"{base}|{event.end.isoformat()}"):
+            record = self.events.get(candidate)
+            if record is not None and parse_time(record["end"]) == event.end:
+                return record
+        # 終了日時が一致する記録がなければ、同じキーの記録と比べて変更として扱う
+        return self.events.get(key)
+
+    def diff(self, schedule, now):
+        """now の時点の EventSchedule と記録を比べて、新規・変更・まもなく終了を返す"""
+        if not self.loaded:
+            self.load()
+
+        result = EventDiff()
+        active = schedule.active_at(now)
+        keys = {_identity(event): key for event, key in zip(active, event_keys(active))}
+        for event in active:
+            record = self._record_for(event, keys[_identity(event)])
+            if record is None:
+                result.new.append(event)
+            elif parse_time(record["end"]) != event.end or record["formatted"] != event.formatted:
+                result.changed.append(event)
+
+        announced = {event.formatted for event in result.new + result.changed}
+        for event in schedule.ending_within(now, self.ending_soon_hours):
+            record = self._record_for(event, keys.get(_identity(event), event_key(event)))
+            if record is not None and not record.get("ending_notified") and event.formatted not in announced:
+                result.ending_soon.append(event)
+        return result
+
+    def commit(self, events, now):
+        """通知が完了したイベントを記録する (通知に成功してから呼ぶこと)"""
+        for event, key in zip(events, event_keys(events)):
+            record = self._record_for(event, key) or {}
+            changed = "end" not in record or parse_time(record["end"]) != event.end
+            self.events[key] = {
+                "name": event.name,
+                "start": event.start.isoformat(),
+                "end": event.end.isoformat(),
+                "formatted": event.formatted,
+                "first_seen": record.get("first_seen", now.isoformat()),
+                "last_seen": now.isoformat(),
+                "ending_notified": (
+                    not changed and record.get("ending_notified", False)
+                ) or event.end - now <= self.ending_soon,
+            }
+
+        # 終了から時間が経ったイベントは削除する
+        cutoff = now - RETENTION
+        self.events = {
+            key: record for key, record in self.events.items()
+            if parse_time(record["end"]) >= cutoff
+        }
+        self.backend.save({"version": STATE_VERSION, "events": self.events})
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import os
+
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# キャッシュの保存先 (/tmp はLambdaのウォームスタート間で保持される)
+CACHE_DIR = os.environ.get("FETCH_CACHE_DIR", "/tmp/wiki_reminder_cache")
+
+
+def _supported_encodings():
+    """requests(urllib3)が展開できる圧縮形式だけを Accept-Encoding に載せる"""
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append("br")
+        except ImportError:
+            pass
+    return ", ".join(encodings)
+
+
+ACCEPT_ENCODING = _supported_encodings()
+
+# 本文を受信するときに1回で読む最大バイト数
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _read_body(response, deadline=None):
+    """本文を届いた分ずつ受信し、その合間に締め切りを確認する。
+
+    requests の timeout はソケットの読み込み1回ごとの待ち時間なので、
+    少しずつ送られてくるとページ全体の受信時間は制限されない。
+    """
+    raw = response.raw
+    if hasattr(raw, "read1"):
+        # urllib3 2 以降: 届いている分だけを返す (空なら受信完了)
+        chunks = iter(lambda: raw.read1(READ_CHUNK_SIZE, decode_content=True), b"")
+    else:
+        chunks = response.iter_content(READ_CHUNK_SIZE)
+    body = []
+    try:
+        for chunk in chunks:
+            body.append(chunk)
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded("ページの受信が時間予算内に完了しませんでした。")
+    except (ReadTimeoutError, ProtocolError) as e:
+        # read1 は urllib3 の例外をそのまま送出するので、requests.get と同じ例外にする
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"ページの受信が時間予算内に完了しませんでした: {e}") from e
+        if isinstance(e, ReadTimeoutError):
+            raise requests.ReadTimeout(e) from e
+        raise requests.ConnectionError(e) from e
+    return b"".join(body)
+
+
+class CacheBackend:
+    """キャッシュ保存先のインターフェース (S3やDynamoDBなどに差し替え可能)"""
+
+    def load(self, key):
+        raise NotImplementedError
+
+    def save(self, key, entry):
+        raise NotImplementedError
+
+
+class FileCacheBackend(CacheBackend):
+    """ローカルディスク (/tmp) にJSONで保存するバックエンド"""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, key):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"キャッシュの読み込みに失敗しました: {e}")
+            return None
+
+    def save(self, key, entry):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"キャッシュの保存に失敗しました: {e}")
+
+
+class FetchResult:
+    """FetchCache.fetch の結果 (本文またはキャッシュ済みの解析結果)"""
+
+    def __init__(self, text=None, parsed=None, etag=None, last_modified=None, body_hash=None, size=0):
+        self.text = text
+        self.parsed = parsed
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+        self.size = size  # 受信した本文のバイト数 (304 の場合は 0)
+
+    @property
+    def from_cache(self):
+        return self.parsed is not None
+
+
+class FetchCache:
+    """条件付きリクエストと解析結果のキャッシュをまとめて扱う"""
+
+    def __init__(self, backend=None, parser_version="1"):
+        self.backend = backend or FileCacheBackend()
+        self.parser_version = parser_version
+
+    def _cached_parsed(self, entry):
+        if not entry or entry.get("parser_version") != self.parser_version:
+            return None
+        return entry.get("parsed")
+
+    def fetch(self, url, headers=None, timeout=30, session=None, deadline=None, key=None):
+        """ETag / Last-Modified を送ってページを取得する。
+
+        304 または本文のハッシュが前回と同じ場合は、キャッシュ済みの解析結果を
+        FetchResult.parsed に入れて返す (この場合 text は None)。
+        本文の受信中に deadline を過ぎた場合は DeadlineExceeded を送出する。
+        key はキャッシュのキー (省略時は url。同じページを別の条件で解析する場合は分ける)。
+        """
+        key = key or url
+        entry = self.backend.load(key)
+        cached_parsed = self._cached_parsed(entry)
+
+        request_headers = dict(headers or {})
+        request_headers.setdefault("Accept-Encoding", ACCEPT_ENCODING)
+        # 解析結果が使えない場合は 304 を受け取っても意味がないので検証子を送らない
+        if cached_parsed is not None:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        http = session or requests
+        # 本文は締め切りを確認しながら受信する
+        with http.get(url, headers=request_headers, timeout=timeout, stream=True) as response:
+            if response.status_code == 304 and cached_parsed is not None:
+                logger.info("ページは更新されていません (304)。キャッシュ済みの解析結果を使用します。")
+                return FetchResult(
+                    parsed=cached_parsed,
+                    etag=entry.get("etag"),
+                    last_modified=entry.get("last_modified"),
+                    body_hash=entry.get("body_hash"),
+                )
+
+            if response.status_code != 200:
+                logger.error(f"ページの取得に失敗しました。ステータスコード: {response.status_code}")
+                raise Exception(f"ページの取得に失敗しました。ステータスコード: {response.status_code}")
+
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            content = _read_body(response, deadline)
+
+        body_hash = hashlib.sha256(content).hexdigest()
+
+        if cached_parsed is not None and entry.get("body_hash") == body_hash:
+            logger.info("ページ内容に変更はありません。キャッシュ済みの解析結果を使用します。")
+            # 検証子だけ更新しておく
+            entry.update({"etag": etag, "last_modified": last_modified})
+            self.backend.save(key, entry)
+            return FetchResult(
+                parsed=cached_parsed,
+                etag=etag,
+                last_modified=last_modified,
+                body_hash=body_hash,
+                size=len(content),
+            )
+
+        return FetchResult(
+            text=content.decode("utf-8", errors="replace"),
+            etag=etag,
+            last_modified=last_modified,
+            body_hash=body_hash,
+            size=len(content),
+        )
+
+    def last_parsed(self, key):
+        """前回保存した解析結果を返す (ページを取得できなかったときの代替用)"""
+        return self._cached_parsed(self.backend.load(key))
+
+    def store(self, key, result, parsed):
+        """解析結果を検証子と一緒に保存する (key は fetch に渡したもの、省略した場合は URL)"""
+        self.backend.save(key, {
+            "parser_version": self.parser_version,
+            "etag": result.etag,
+            "last_modified": result.last_modified,
+            "body_hash": result.body_hash,
+            "parsed": parsed,
+        })
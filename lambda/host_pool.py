@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deadline import Deadline, DeadlineExceeded
+
+# 同じホストへの同時リクエスト数と、リクエストを開始する最小間隔 (秒)
+HOST_CONCURRENCY = int(os.environ.get("HOST_CONCURRENCY", "2"))
+HOST_MIN_INTERVAL = float(os.environ.get("HOST_MIN_INTERVAL", "0.5"))
+
+
+class _Host:
+    def __init__(self, concurrency):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.next_request_at = 0.0
+
+
+class HostPool:
+    """ホストごとのセッション (コネクションプール) と、相手に負荷をかけすぎないための制限"""
+
+    def __init__(self, concurrency=HOST_CONCURRENCY, min_interval=HOST_MIN_INTERVAL,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.concurrency = max(1, concurrency)
+        self.min_interval = min_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def _host(self, url):
+        netloc = urlsplit(url).netloc
+        with self.lock:
+            host = self.hosts.get(netloc)
+            if host is None:
+                host = self.hosts[netloc] = _Host(self.concurrency)
+            return host
+
+    @contextmanager
+    def slot(self, url, deadline=None):
+        """url のホストにリクエストしてよい状態になるまで待ち、そのホストのセッションを返す"""
+        deadline = deadline or Deadline()
+        host = self._host(url)
+        # 締め切りがない場合は空くまで待つ
+        timeout = None if deadline.expires_at is None else deadline.timeout(deadline.remaining())
+        if not host.semaphore.acquire(timeout=timeout):
+            raise DeadlineExceeded(f"{urlsplit(url).netloc} への接続待ちが時間予算内に終わりませんでした。")
+        try:
+            with self.lock:
+                now = self.clock()
+                delay = max(0.0, host.next_request_at - now)
+                host.next_request_at = max(now, host.next_request_at) + self.min_interval
+            if delay > 0:
+                deadline.sleep(delay, self.sleep)
+            yield host.session
+        finally:
+            host.semaphore.release()
+
+
+# ウォームスタート間で使い回す (HTTPコネクションをプールする)
+hosts = HostPool()
@@ -0,0 +1,205 @@
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 使用するHTMLパーサー (auto / selectolax / lxml / html.parser)
+HTML_BACKEND = os.environ.get("HTML_BACKEND", "auto")
+
+# イベント情報が載っている領域のid (カンマ区切り)。空にするとページ全体を解析する
+EVENT_SECTION_IDS = [
+    section_id.strip()
+    for section_id in os.environ.get("EVENT_SECTION_IDS", "body").split(",")
+    if section_id.strip()
+]
+
+
+# バックエンドごとに読み込むモジュール (bs4 などは読み込みに時間がかかるので、使うときまで読み込まない)
+_BACKEND_MODULES = {
+    "selectolax": "selectolax.lexbor",
+    "lxml": "bs4",
+    "html.parser": "bs4",
+}
+
+
+def _has_module(name):
+    """インストールされているか (読み込みはしない)"""
+    return importlib.util.find_spec(name) is not None
+
+
+def _import(name):
+    try:
+        importlib.import_module(name)
+    except ImportError as e:
+        logger.warning(f"{name} の読み込みに失敗しました: {e}")
+
+
+def preload(backend=None):
+    """バックエンドのモジュールをバックグラウンドで読み込み始める。
+
+    ページの取得中 (通信待ち) に呼んでおくと、コールドスタート時に
+    取得と読み込みを並行して進められる。
+    """
+    module = _BACKEND_MODULES.get(resolve_backend(backend), "bs4")
+    if module in sys.modules:
+        return None  # ウォームスタートでは読み込み済み
+    thread = threading.Thread(target=_import, args=(module,), daemon=True)
+    thread.start()
+    return thread
+
+
+def resolve_backend(name=None):
+    """利用可能なバックエンド名を返す (auto の場合は速いものから順に選ぶ)"""
+    name = name or HTML_BACKEND
+    if name == "auto":
+        if _has_module("selectolax"):
+            return "selectolax"
+        if _has_module("lxml"):
+            return "lxml"
+        return "html.parser"
+    if name in ("selectolax", "lxml") and not _has_module(name):
+        logger.warning(f"{name} がインストールされていないため html.parser を使用します。")
+        return "html.parser"
+    return name
+
+
+class HtmlDocument:
+    """解析済みHTMLのインターフェース"""
+
+    def iter_blocks(self, tags):
+        """tags のいずれかに当たる要素ごとに (タグ名, strip済みで連結したテキスト) を文書順に返す。
+
+        文書は1回だけ走査する。入れ子になった要素のテキストは子孫の結果を再利用するので、
+        処理量はリストの入れ子の深さではなく文書の大きさに比例する。
+        """
+        raise NotImplementedError
+
+    def iter_texts(self, tag):
+        """tag 要素ごとの (strip済みで連結した) テキストを文書順に返す"""
+        for _, text in self.iter_blocks((tag,)):
+            yield text
+
+
+class SoupDocument(HtmlDocument):
+    """BeautifulSoup (html.parser / lxml) による実装"""
+
+    def __init__(self, html, features="html.parser", section_ids=None):
+        from bs4 import BeautifulSoup, CData, NavigableString, SoupStrainer
+
+        # section_ids が指定されていればその領域だけを木として構築する
+        parse_only = SoupStrainer(id=list(section_ids)) if section_ids else None
+        self.soup = BeautifulSoup(html, features, parse_only=parse_only)
+        self.string_type = NavigableString
+        # get_text() が対象にする文字列の種類 (コメントや script の中身は含めない)
+        self.text_types = (NavigableString, CData)
+
+    def iter_blocks(self, tags):
+        string_type, text_types = self.string_type, self.text_types
+        blocks = []  # 開始タグ順の (タグ名, テキスト片のリスト)
+        ancestors = []  # 走査中の位置を含む対象要素のテキスト片のリスト
+        # 再帰の代わりに (子要素のイテレーター, 対象要素か) のスタックで深さ優先に走査する
+        stack = [(iter(self.soup.contents), False)]
+        while stack:
+            children, is_block = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                if is_block:
+                    ancestors.pop()
+                continue
+
+            if isinstance(child, string_type):
+                # 葉のテキストを、それを含むすべての対象要素に追加する
+                if type(child) in text_types:
+                    text = child.strip()
+                    if text:
+                        for parts in ancestors:
+                            parts.append(text)
+                continue
+
+            is_block = child.name in tags
+            if is_block:
+                parts = []
+                blocks.append((child.name, parts))
+                ancestors.append(parts)
+            stack.append((iter(child.contents), is_block))
+
+        for tag, parts in blocks:
+            yield tag, "".join(parts)
+
+
+# 中身がテキストではない要素 (selectolax ではテキストに含まれてしまうので、解析後に取り除く)
+NON_TEXT_TAGS = ("script", "style")
+
+
+class SelectolaxDocument(HtmlDocument):
+    """selectolax (lexbor) による実装"""
+
+    def __init__(self, html, section_ids=None):
+        from selectolax.lexbor import LexborHTMLParser
+
+        tree = LexborHTMLParser(html)
+        # BeautifulSoup の get_text() と同じく、script / style の中身はテキストに含めない
+        tree.strip_tags(list(NON_TEXT_TAGS), recursive=True)
+        if section_ids:
+            self.roots = tree.css(", ".join(f"#{section_id}" for section_id in section_ids))
+        else:
+            self.roots = [tree.root] if tree.root is not None else []
+
+    def iter_blocks(self, tags):
+        blocks = []
+        for root in self.roots:
+            blocks.extend(root.css(", ".join(tags)))
+
+        # 対象要素を子孫に持つ要素 (ここだけは子を1つずつたどる必要がある)
+        containers = set()
+        for node in blocks:
+            parent = node.parent
+            while parent is not None and parent.mem_id not in containers:
+                containers.add(parent.mem_id)
+                parent = parent.parent
+
+        # 文書の後ろ (内側) の要素から順にテキストを求め、外側の要素ではその結果を再利用する
+        texts = {}
+
+        def text_of(node):
+            parts = []
+            child = node.child
+            while child is not None:
+                child_id = child.mem_id
+                if child_id in texts:
+                    parts.append(texts[child_id])
+                elif child.tag == "-text":
+                    text = child.text_content.strip()
+                    if text:
+                        parts.append(text)
+                elif child_id in containers:
+                    parts.append(text_of(child))
+                else:
+                    # 対象要素を含まない部分木はまとめて lexbor に連結させる
+                    parts.append(child.text(deep=True, separator="", strip=True))
+                child = child.next
+            return "".join(parts)
+
+        for node in reversed(blocks):
+            if node.mem_id in containers:
+                texts[node.mem_id] = text_of(node)
+            else:
+                texts[node.mem_id] = node.text(deep=True, separator="", strip=True)
+        for node in blocks:
+            yield node.tag, texts[node.mem_id]
+
+
+def parse_html(html, backend=None, section_ids=None):
+    """HTMLを解析して HtmlDocument を返す。
+
+    section_ids を渡すと、その id を持つ要素の中だけを対象にする (targeted モード)。
+    """
+    backend = resolve_backend(backend)
+    if backend == "selectolax":
+        return SelectolaxDocument(html, section_ids=section_ids)
+    return SoupDocument(html, features=backend, section_ids=section_ids)
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# CloudWatch メトリクスの名前空間
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "WikiReminderBot")
+
+# カウンターの単位 (ここにないものは Count)
+COUNTER_UNITS = {
+    "bytes_downloaded": "Bytes",
+}
+
+
+class Metrics:
+    """1回の実行分の計測値 (段階ごとの所要時間とカウンター) を集める。
+
+    取得元ごとの処理を並行して実行するので、更新はスレッドセーフにしている。
+    並行した段階の所要時間はそれぞれ加算される。
+    """
+
+    def __init__(self, namespace=METRICS_NAMESPACE, clock=time.perf_counter):
+        self.namespace = namespace
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.spans = {}  # 段階名 -> 合計ミリ秒
+        self.counters = {}
+        self.properties = {}
+        self.started_at = self.clock()
+
+    @contextmanager
+    def span(self, name):
+        """with ブロックの所要時間を name の段階として加算する"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            elapsed = (self.clock() - start) * 1000
+            with self.lock:
+                self.spans[name] = self.spans.get(name, 0.0) + elapsed
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_property(self, name, value):
+        """メトリクスにはしないが、集計レコードに含める値"""
+        with self.lock:
+            self.properties[name] = value
+
+    def emf_record(self):
+        """CloudWatch Embedded Metric Format の集計レコードを作る"""
+        function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "local")
+        values = {"total_ms": round((self.clock() - self.started_at) * 1000, 3)}
+        definitions = [{"Name": "total_ms", "Unit": "Milliseconds"}]
+        for name, elapsed in self.spans.items():
+            values[f"{name}_ms"] = round(elapsed, 3)
+            definitions.append({"Name": f"{name}_ms", "Unit": "Milliseconds"})
+        for name, value in self.counters.items():
+            values[name] = value
+            definitions.append({"Name": name, "Unit": COUNTER_UNITS.get(name, "Count")})
+
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [["FunctionName"]],
+                    "Metrics": definitions,
+                }],
+            },
+            "FunctionName": function_name,
+        }
+        record.update(self.properties)
+        record.update(values)
+        return record
+
+    def emit(self):
+        """集計レコードを1行のJSONとして標準出力に書く (CloudWatch Logs がメトリクスとして取り込む)"""
+        print(json.dumps(self.emf_record(), ensure_ascii=False), flush=True)
+
+
+# モジュール全体で共有する計測値 (実行ごとに reset する)
+metrics = Metrics()
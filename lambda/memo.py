@@ -0,0 +1,52 @@
+import os
+import threading
+from collections import OrderedDict
+
+# 整形結果のキャッシュの最大件数 (キャッシュごと)
+RENDER_CACHE_SIZE = int(os.environ.get("RENDER_CACHE_SIZE", "4096"))
+
+_MISSING = object()
+
+
+class LRUCache:
+    """件数に上限のある LRU キャッシュ。
+
+    モジュール変数として持てばウォームスタート間で使い回せる。
+    取得元ごとの解析を並行して行うので、更新はスレッドセーフにしている。
+    """
+
+    def __init__(self, maxsize=RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute, *args):
+        """key の値を返す (なければ compute(*args) で計算して保存する)"""
+        with self.lock:
+            value = self.data.get(key, _MISSING)
+            if value is not _MISSING:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return value
+
+        # 計算中はロックを持たない (同じ key を同時に計算した場合は後の結果が残る)
+        value = compute(*args)
+        with self.lock:
+            self.misses += 1
+            if self.maxsize > 0:
+                self.data[key] = value
+                self.data.move_to_end(key)
+                if len(self.data) > self.maxsize:
+                    self.data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
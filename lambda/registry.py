@@ -0,0 +1,123 @@
+import json
+import os
+import re
+
+# 取得元と通知先の設定 (JSON文字列、またはJSONファイルのパス)。
+# 未指定の場合は WIKI_URL と WEBHOOK_URL の1組だけを使う
+#
+#   {
+#     "sources": [
+#       {"name": "bluearchive", "url": "https://bluearchive.wikiru.jp/"},
+#       {"name": "other", "url": "https://example.wikiru.jp/", "section_ids": ["body"]}
+#     ],
+#     "targets": [
+#       {"name": "main", "webhook_url_env": "WEBHOOK_URL"},
+#       {"name": "pickup", "webhook_url": "https://discord.com/api/webhooks/...",
+#        "sources": ["bluearchive"], "include": ["ピックアップ"], "mode": "full"}
+#     ]
+#   }
+NOTIFY_CONFIG = os.environ.get("NOTIFY_CONFIG", "")
+
+DEFAULT_NAME = "default"
+
+
+class Source:
+    """イベント情報の取得元 (wikiのページ1つ)"""
+
+    def __init__(self, name, url, section_ids=None):
+        self.name = name
+        self.url = url
+        self.section_ids = section_ids  # None の場合は EVENT_SECTION_IDS を使う
+
+    def __repr__(self):
+        return f"Source({self.name!r}, {self.url!r})"
+
+
+class Target:
+    """通知先 (Discord Webhook 1つ) と、そこに送るイベントの条件"""
+
+    def __init__(self, name, webhook_url, sources=None, include=(), exclude=(), mode=None):
+        self.name = name
+        self.webhook_url = webhook_url
+        self.sources = sources  # 購読する取得元の名前 (None の場合はすべて)
+        self.include = [re.compile(pattern) for pattern in include]
+        self.exclude = [re.compile(pattern) for pattern in exclude]
+        self.mode = mode  # None の場合は NOTIFY_MODE を使う
+
+    def matches(self, event):
+        """イベント名が include のいずれかに一致し、exclude のどれにも一致しないか"""
+        if self.include and not any(pattern.search(event.name) for pattern in self.include):
+            return False
+        return not any(pattern.search(event.name) for pattern in self.exclude)
+
+    def __repr__(self):
+        return f"Target({self.name!r})"
+
+
+class Registry:
+    """取得元と通知先の一覧"""
+
+    def __init__(self, sources, targets):
+        self.sources = {}
+        for source in sources:
+            if source.name in self.sources:
+                raise ValueError(f"取得元の名前が重複しています: {source.name}")
+            self.sources[source.name] = source
+
+        self.targets = []
+        for target in targets:
+            if any(other.name == target.name for other in self.targets):
+                raise ValueError(f"通知先の名前が重複しています: {target.name}")
+            for name in target.sources or ():
+                if name not in self.sources:
+                    raise ValueError(f"通知先 {target.name} の取得元 {name} が定義されていません")
+            self.targets.append(target)
+
+    def sources_for(self, target):
+        """通知先が購読している取得元"""
+        if target.sources is None:
+            return list(self.sources.values())
+        return [self.sources[name] for name in target.sources]
+
+    def subscribed_sources(self):
+        """いずれかの通知先が購読している取得元 (取得・解析は取得元ごとに1回だけ行う)"""
+        names = set()
+        for target in self.targets:
+            names.update(source.name for source in self.sources_for(target))
+        return [source for name, source in self.sources.items() if name in names]
+
+    @classmethod
+    def from_dict(cls, config):
+        sources = [
+            Source(item["name"], item["url"], item.get("section_ids"))
+            for item in config.get("sources", [])
+        ]
+        targets = []
+        for item in config.get("targets", []):
+            webhook_url = item.get("webhook_url")
+            if not webhook_url and item.get("webhook_url_env"):
+                # Webhook URL を設定ファイルに書かずに環境変数から読む
+                webhook_url = os.environ.get(item["webhook_url_env"])
+            targets.append(Target(
+                item["name"],
+                webhook_url,
+                sources=item.get("sources"),
+                include=item.get("include", ()),
+                exclude=item.get("exclude", ()),
+                mode=item.get("mode"),
+            ))
+        return cls(sources, targets)
+
+
+def load_registry(default_url, default_webhook_url, config=None):
+    """NOTIFY_CONFIG から Registry を作る (未指定なら既定の取得元と通知先の1組)"""
+    config = NOTIFY_CONFIG if config is None else config
+    if not config:
+        return Registry(
+            [Source(DEFAULT_NAME, default_url)],
+            [Target(DEFAULT_NAME, default_webhook_url)],
+        )
+    if config.lstrip().startswith("{"):
+        return Registry.from_dict(json.loads(config))
+    with open(config, "r", encoding="utf-8") as f:
+        return Registry.from_dict(json.load(f))
@@ -1,12 +1,28 @@
 import requests
-from bs4 import BeautifulSoup
 import re
 import os
 import logging
-from datetime import datetime, timedelta
+import random
+from concurrent.futures import ThreadPoolExecutor
 
-# ロギング設定
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from deadline import Deadline, DeadlineExceeded
+from date_extractor import find_date_range, iter_date_ranges, strip_date_ranges
+from discord_delivery import build_payloads, get_client
+from event_model import EventSchedule, ScheduleGroup, now_jst, parse_time
+from event_state import EventStateStore, default_backend
+from fetch_cache import FetchCache
+from host_pool import hosts
+from html_backend import EVENT_SECTION_IDS, parse_html, preload
+from instrumentation import metrics
+from memo import LRUCache
+from registry import load_registry
+
+# ロギング設定 (リスト項目ごとの詳細ログは LOG_LEVEL=DEBUG のときだけ出力する)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+if not os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+    logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
+# Lambda ではルートロガーが設定済みのため、レベルだけ明示的に設定する
+logging.getLogger().setLevel(LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 # 環境変数から取得
@@ -17,340 +33,255 @@ if not WEBHOOK_URL:
     # DiscordのWebhook URLを設定してね！
     WEBHOOK_URL = "https://discord.com/api/webhooks/あなたのWebhook URL"
 
-def extract_original_time(date_str):
-    """元の文字列から時間部分 (HH:MM) を抽出する"""
-    time_match = re.search(r"(\d{1,2}):(\d{2})", date_str)
-    if time_match:
-        return f"{time_match.group(1)}:{time_match.group(2)}"
-    return None
-
-def format_event_date(start_date, end_date, original_date_text):
-    """元の日付テキストから時間を抽出し、指定された形式でフォーマットする"""
-    logger.info(f"元の日付テキスト: {original_date_text}")
-    
-    # 日付部分の分割
-    if "～" in original_date_text:
-        date_parts = original_date_text.split("～")
-    elif "~" in original_date_text:
-        date_parts = original_date_text.split("~")
-    else:
-        # 分割できない場合はデフォルトのフォーマット使用
-        start_str = start_date.strftime('%Y/%m/%d %H:%M')
-        end_str = end_date.strftime('%Y/%m/%d %H:%M')
-        logger.warning(f"日付テキストを分割できませんでした: {original_date_text}")
-        return f"{start_str} ~ {end_str}"
-    
-    # 開始日時部分と終了日時部分
-    start_date_str = date_parts[0].strip()
-    end_date_str = date_parts[1].strip() if len(date_parts) > 1 else ""
-    
-    logger.info(f"開始日部分: {start_date_str}")
-    logger.info(f"終了日部分: {end_date_str}")
-    
-    # 開始日のフォーマット (年/月/日)
-    start_formatted = start_date.strftime('%Y/%m/%d')
-    
-    # 終了日のフォーマット (年/月/日) - 開始日の年を使用
-    end_formatted = f"{start_date.year}/{end_date.strftime('%m/%d')}"
-    
-    # 元の時間形式を抽出
-    start_time = extract_original_time(start_date_str) or start_date.strftime('%H:%M')
-    end_time = extract_original_time(end_date_str) or end_date.strftime('%H:%M')
-    
-    logger.info(f"抽出した開始時間: {start_time}")
-    logger.info(f"抽出した終了時間: {end_time}")
-    
-    # 出力形式: 2025/05/14 11:00 ~ 2025/05/21 10:59
-    formatted_result = f"{start_formatted} {start_time} ~ {end_formatted} {end_time}"
-    logger.info(f"フォーマット結果: {formatted_result}")
-    return formatted_result
-
-def fetch_current_events():
-    url = "https://bluearchive.wikiru.jp/"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+# 通知モード (diff: 前回からの差分のみ / full: 開催中のイベントをすべて)
+NOTIFY_MODE = os.environ.get("NOTIFY_MODE", "diff")
+
+# デバッグ用に取得したHTMLを保存する割合 (0.0〜1.0、デフォルトは保存しない) と保存先
+DEBUG_HTML_SAMPLE_RATE = float(os.environ.get("DEBUG_HTML_SAMPLE_RATE", "0"))
+DEBUG_HTML_PATH = os.environ.get("DEBUG_HTML_PATH", "/tmp/debug_html.txt")
+
+def format_event_date(date_range):
+    """日付範囲を表示用の形式 (2025/05/14 11:00 ~ 2025/05/21 10:59) にする。
+
+    時刻は元のテキストの書き方 ("4:00" など) をそのまま使い、書かれていなければ補う。
+    終了日の年は抽出済みの終了日時のもの (年をまたぐ期間では翌年) を使う。
+    """
+    start, end = date_range.start, date_range.end
+    start_time = date_range.start_clock or f"{start:%H:%M}"
+    end_time = date_range.end_clock or f"{end:%H:%M}"
+    return f"{start:%Y/%m/%d} {start_time} ~ {end:%Y/%m/%d} {end_time}"
+
+# ページ取得時のキャッシュ (解析ロジックを変更したら PARSER_VERSION を上げること)
+PARSER_VERSION = "7"
+fetch_cache = FetchCache(parser_version=PARSER_VERSION)
+
+# イベント名と日付の整形結果 (元のテキストをキーにする)。同じイベントは毎日、
+# 同じページ内でも何度も出てくるので、ウォームスタート間で使い回す
+event_names = LRUCache()
+fallback_names = LRUCache()
+formatted_dates = LRUCache()
+
+WIKI_URL = "https://bluearchive.wikiru.jp/"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# 取得元の取得・解析と通知先への送信を並行して行うスレッド数
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "4"))
+
+# 各段階の時間予算 (秒)。Lambda の残り時間から、後の段階の分を残して割り当てる
+FETCH_TIMEOUT = 30  # ページ取得のタイムアウト上限
+PARSE_RESERVE = 3.0  # 解析のために残しておく時間
+DELIVERY_RESERVE = 5.0  # 通知のために残しておく時間
+
+# 解析中に締め切りを確認する間隔 (リスト項目数)
+DEADLINE_CHECK_INTERVAL = 20
+
+# 時間のパターン - これを使って余計な時間表記を除去する
+TIME_RE = re.compile(r'\(\s*\d{1,2}:\d{2}\)')
+EMPTY_BRACKETS_RE = re.compile(r'\(\s*\)')
+WHITESPACE_RE = re.compile(r'[\s　]+')
+TRAILING_COLON_RE = re.compile(r'[:：]$')
+
+def make_candidate(event_name, date_range):
+    """日付に依存しない解析結果 (キャッシュ可能な形式) を作る"""
+    # 日付情報の整形 (日付範囲は元の日付テキストだけで決まる)
+    formatted_date = formatted_dates.get(date_range.text, format_event_date, date_range)
+    return {
+        "name": event_name,
+        "start": date_range.start.isoformat(),
+        "end": date_range.end.isoformat(),
+        # イベント情報のフォーマット (イベント名 (日付))
+        "formatted": f"{event_name} ({formatted_date})",
     }
-    
-    try:
-        logger.info(f"URLにリクエスト送信中: {url}")
-        response = requests.get(url, headers=headers, timeout=30)
-        response.encoding = 'utf-8'
-        
-        if response.status_code != 200:
-            logger.error(f"ページの取得に失敗しました。ステータスコード: {response.status_code}")
-            raise Exception(f"ページの取得に失敗しました。ステータスコード: {response.status_code}")
-        
-        logger.info("ページの取得に成功しました。HTMLの解析を開始します。")
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # デバッグ用：HTMLを保存
-        with open("/tmp/debug_html.txt", "w", encoding="utf-8") as f:
-            f.write(response.text)
-        logger.info("デバッグ用にHTMLを保存しました。")
-        
-        # イベント情報を格納するリスト
-        current_events = []  # 現在開催中のイベントを格納するリスト
-        
-        # 現在の日付を取得
-        today = datetime.now()
-        logger.info(f"現在の日付: {today.strftime('%Y/%m/%d')}")
-        
-        # 日付パターンの正規表現（より厳密に）
-        date_patterns = [
-            r"\d{4}[/-]\d{1,2}[/-]\d{1,2}.*?\d{1,2}:\d{2}.*?[～~].*?\d{1,2}[/-]\d{1,2}.*?\d{1,2}:\d{2}",  # 2025/5/14 11:00 ～ 5/21 3:59
-            r"\d{4}[/-]\d{1,2}[/-]\d{1,2}.*?[～~].*?\d{1,2}[/-]\d{1,2}",  # 2025/5/14 ～ 5/21
-            r"\d{4}[/-]\d{1,2}[/-]\d{1,2}.*?[～~].*?",  # 2025/5/14 ～ （終了日不明）
-            r"[～~].*?\d{4}[/-]\d{1,2}[/-]\d{1,2}",  # ～ 2025/5/21（開始日不明）
-            r"\(\d{4}[/-]\d{1,2}[/-]\d{1,2}.*?\d{1,2}:\d{2}.*?[～~].*?\d{1,2}[/-]\d{1,2}.*?\d{1,2}:\d{2}\)"  # (2025/5/14 11:00 ～ 5/21 3:59)
-        ]
-        
-        # 時間のパターン - これを使って余計な時間表記を除去する
-        time_pattern = r'\(\s*\d{1,2}:\d{2}\)'
-        
-        # リスト項目（li）のみに絞って探す
-        logger.info("リスト項目(li)を探します...")
-        list_items = soup.find_all("li")
-        logger.info(f"{len(list_items)}個のリスト項目が見つかりました。")
-        
-        for li in list_items:
-            text = li.get_text(strip=True)
-            
+
+def clean_event_name(text):
+    """リスト項目のテキストから日付や時間表記を除いたイベント名を作る"""
+    # ----- イベント名抽出処理改善 -----
+
+    # 1. まず日付パターンをテキストから除去
+    event_name = strip_date_ranges(text)
+
+    # 2. 時間表記 (10:59) や (3:59) などを除去
+    event_name = TIME_RE.sub("", event_name)
+
+    # 3. 空の括弧 () を削除
+    event_name = EMPTY_BRACKETS_RE.sub("", event_name)
+
+    # 4. 余分な記号や空白を整理
+    event_name = WHITESPACE_RE.sub(' ', event_name).strip()
+    event_name = TRAILING_COLON_RE.sub('', event_name).strip()
+
+    # 5. 最後にチェック - あまりにも短すぎる場合や空になった場合
+    if len(event_name) < 5:
+        # オリジナルテキストから時間表記だけ除去して使用
+        event_name = TIME_RE.sub("", text).strip()
+        # 空の括弧も除去
+        event_name = EMPTY_BRACKETS_RE.sub("", event_name)
+
+    # イベント名が空になってしまった場合は「不明なイベント」とする
+    if not event_name:
+        event_name = "不明なイベント"
+    return event_name
+
+def clean_fallback_name(text):
+    """ul全体のテキストからイベント名を作る (フォールバック用)"""
+    # 日付パターンと時間表記を除去
+    event_text = strip_date_ranges(text)
+    event_text = TIME_RE.sub("", event_text)
+    # 空の括弧を削除
+    event_text = EMPTY_BRACKETS_RE.sub("", event_text)
+    event_text = WHITESPACE_RE.sub(' ', event_text).strip()
+
+    if len(event_text) < 5:
+        event_text = "イベント情報"
+    return event_text
+
+def extract_events(document, deadline=None):
+    """解析済みの文書から日付付きのイベント候補をすべて抽出する。
+
+    文書は1回だけ走査し、リスト項目 (li) とフォールバック用のリスト (ul) の
+    テキストを同じ走査結果から受け取る。
+    締め切りを過ぎた場合はそこで打ち切り、結果に truncated=True を付ける。
+    """
+    deadline = deadline or Deadline()
+    truncated = False
+
+    # リスト項目から見つかったイベント候補
+    items = []
+    # リスト項目で開催中のイベントが見つからなかった場合に使うフォールバック候補
+    fallback = []
+
+    logger.debug("リスト項目(li)とリスト(ul)を探します...")
+    item_count = 0
+
+    for tag, text in document.iter_blocks(("li", "ul")):
+        if tag == "li":
+            item_count += 1
+            if item_count % DEADLINE_CHECK_INTERVAL == 0 and deadline.expired():
+                logger.warning("解析の時間予算を使い切ったため、リスト項目の確認を打ち切ります。")
+                truncated = True
+                break
+
             # 短すぎるテキストは除外
             if len(text) < 10:
                 continue
-                
-            logger.info(f"リスト項目のテキスト: {text}")
-            
-            # 日付パターンを含むかチェック
-            date_found = False
-            date_text = ""
-            
-            # 括弧付きの日付パターンを優先して検索
-            if "(" in text and ")" in text:
-                # 括弧内のテキストを抽出
-                bracket_matches = re.findall(r'\((.*?)\)', text)
-                for bracket_text in bracket_matches:
-                    if "～" in bracket_text or "~" in bracket_text:
-                        for pattern in date_patterns:
-                            match = re.search(pattern, "(" + bracket_text + ")")
-                            if match:
-                                date_found = True
-                                date_text = bracket_text
-                                logger.info(f"括弧内の日付パターン発見: {date_text}")
-                                break
-                    if date_found:
-                        break
-                        
-            # 括弧で見つからなかった場合は通常パターンで検索
-            if not date_found:
-                for pattern in date_patterns:
-                    matches = re.finditer(pattern, text)
-                    for match in matches:
-                        date_found = True
-                        date_text = match.group(0)
-                        # 括弧がある場合は除去
-                        date_text = date_text.strip("()")
-                        logger.info(f"日付パターン発見: {date_text}")
-                        break
-                    if date_found:
-                        break
-            
-            # 日付パターンが見つからなかったらスキップ
-            if not date_found:
-                continue
-                
-            # 日付をパースして現在進行中かチェック
-            try:
-                # 開始日と終了日を抽出
-                if "～" in date_text:
-                    date_parts = date_text.split("～")
-                elif "~" in date_text:
-                    date_parts = date_text.split("~")
-                else:
-                    continue  # 分割できない場合はスキップ
-                
-                # 開始日の処理
-                start_date_str = date_parts[0].strip()
-                start_match = re.search(r"(\d{4})[/-](\d{1,2})[/-](\d{1,2})", start_date_str)
-                if not start_match:
-                    continue  # 開始日が見つからない場合はスキップ
-                
-                start_year = int(start_match.group(1))
-                start_month = int(start_match.group(2))
-                start_day = int(start_match.group(3))
-                
-                # 時間の処理
-                start_hour = 0
-                start_minute = 0
-                time_match = re.search(r"(\d{1,2}):(\d{2})", start_date_str)
-                if time_match:
-                    start_hour = int(time_match.group(1))
-                    start_minute = int(time_match.group(2))
-                
-                start_date = datetime(start_year, start_month, start_day, start_hour, start_minute)
-                
-                # 終了日の処理
-                if len(date_parts) > 1:
-                    end_date_str = date_parts[1].strip()
-                    
-                    # 終了日に年が含まれていない場合は開始日の年を使用
-                    end_match = re.search(r"(?:(\d{4})[/-])?(\d{1,2})[/-](\d{1,2})", end_date_str)
-                    if not end_match:
-                        # 終了日が見つからない場合は1ヶ月後に設定
-                        end_date = start_date + timedelta(days=30)
-                    else:
-                        end_year = int(end_match.group(1)) if end_match.group(1) else start_year
-                        end_month = int(end_match.group(2))
-                        end_day = int(end_match.group(3))
-                        
-                        # 時間が含まれている場合は考慮
-                        end_hour = 23  # デフォルトは23:59
-                        end_minute = 59
-                        
-                        # 元の日付文字列から終了時間を抽出
-                        if end_date_str:
-                            end_time_match = re.search(r"(\d{1,2}):(\d{2})", end_date_str)
-                            if end_time_match:
-                                end_hour = int(end_time_match.group(1))
-                                end_minute = int(end_time_match.group(2))
-                        
-                        end_date = datetime(end_year, end_month, end_day, end_hour, end_minute)
-                else:
-                    # 終了日が指定されていない場合は1ヶ月後に設定
-                    end_date = start_date + timedelta(days=30)
-                
-                # 現在日が開始日と終了日の間かチェック
-                if start_date <= today <= end_date:
-                    logger.info(f"現在開催中のイベント発見: {text}")
-                    
-                    # ----- イベント名抽出処理改善 -----
-                    
-                    # 1. まず日付パターンをテキストから除去
-                    event_name = text
-                    for pattern in date_patterns:
-                        event_name = re.sub(pattern, "", event_name)
-                    
-                    # 2. 時間表記 (10:59) や (3:59) などを除去
-                    event_name = re.sub(time_pattern, "", event_name)
-                    
-                    # 3. 空の括弧 () を削除
-                    event_name = re.sub(r'\(\s*\)', "", event_name)
-                    
-                    # 4. 余分な記号や空白を整理
-                    event_name = re.sub(r'[\s　]+', ' ', event_name).strip()
-                    event_name = re.sub(r'[:：]$', '', event_name).strip()
-                    
-                    # 5. 最後にチェック - あまりにも短すぎる場合や空になった場合
-                    if len(event_name) < 5:
-                        # オリジナルテキストから時間表記だけ除去して使用
-                        event_name = re.sub(r'\(\s*\d{1,2}:\d{2}\)', "", text).strip()
-                        # 空の括弧も除去
-                        event_name = re.sub(r'\(\s*\)', "", event_name)
-                    
-                    # イベント名が空になってしまった場合は「不明なイベント」とする
-                    if not event_name:
-                        event_name = "不明なイベント"
-                    
-                    # 日付情報の整形 - 元の日付テキストを渡して時間情報を保持
-                    formatted_date = format_event_date(start_date, end_date, date_text)
-                    
-                    # イベント情報のフォーマット (イベント名 (日付))
-                    formatted_event = f"{event_name} ({formatted_date})"
-                    
-                    if formatted_event not in current_events:  # 重複チェック
-                        current_events.append(formatted_event)
-            
-            except Exception as e:
-                logger.warning(f"日付解析中にエラーが発生: {e} - テキスト: {date_text}")
+
+            logger.debug("リスト項目のテキスト: %s", text)
+
+            # 日付パターンを含むかチェック (括弧付きの日付を優先)
+            date_range = find_date_range(text)
+            if date_range is None:
                 continue
-        
-        # 何も見つからなかった場合のフォールバック処理
-        if not current_events:
-            logger.warning("リスト項目から現在開催中のイベントが見つかりませんでした。別の方法で再試行します。")
-            
-            # ulタグの中を直接探してみる
-            for ul in soup.find_all("ul"):
-                text = ul.get_text(strip=True)
-                if len(text) > 20:  # 十分な長さがあるか
-                    for pattern in date_patterns:
-                        matches = re.finditer(pattern, text)
-                        for match in matches:
-                            date_text = match.group(0)
-                            logger.info(f"ul内で日付パターン発見: {date_text}")
-                            
-                            try:
-                                # 開始日と終了日の処理（上と同じロジック）
-                                if "～" in date_text or "~" in date_text:
-                                    date_parts = date_text.split("～") if "～" in date_text else date_text.split("~")
-                                    
-                                    # 開始日の処理
-                                    start_date_str = date_parts[0].strip()
-                                    start_match = re.search(r"(\d{4})[/-](\d{1,2})[/-](\d{1,2})", start_date_str)
-                                    if start_match:
-                                        start_year = int(start_match.group(1))
-                                        start_month = int(start_match.group(2))
-                                        start_day = int(start_match.group(3))
-                                        
-                                        # 時間の処理
-                                        start_hour = 0
-                                        start_minute = 0
-                                        time_match = re.search(r"(\d{1,2}):(\d{2})", start_date_str)
-                                        if time_match:
-                                            start_hour = int(time_match.group(1))
-                                            start_minute = int(time_match.group(2))
-                                        
-                                        start_date = datetime(start_year, start_month, start_day, start_hour, start_minute)
-                                        
-                                        # 終了日の処理
-                                        if len(date_parts) > 1:
-                                            end_date_str = date_parts[1].strip()
-                                            end_match = re.search(r"(?:(\d{4})[/-])?(\d{1,2})[/-](\d{1,2})", end_date_str)
-                                            if end_match:
-                                                end_year = int(end_match.group(1)) if end_match.group(1) else start_year
-                                                end_month = int(end_match.group(2))
-                                                end_day = int(end_match.group(3))
-                                                
-                                # 時間が含まれている場合は考慮
-                                                end_hour = 23  # デフォルトは23:59
-                                                end_minute = 59
-                                                
-                                                # 終了日の時間を元のテキストから抽出
-                                                if end_date_str:
-                                                    end_time_match = re.search(r"(\d{1,2}):(\d{2})", end_date_str)
-                                                    if end_time_match:
-                                                        end_hour = int(end_time_match.group(1))
-                                                        end_minute = int(end_time_match.group(2))
-                                                        logger.info(f"終了時間を抽出: {end_hour}:{end_minute}")
-                                                
-                                                end_date = datetime(end_year, end_month, end_day, end_hour, end_minute)
-                                                
-                                                # 現在日が範囲内かチェック
-                                                if start_date <= today <= end_date:
-                                                    # イベント名を抽出する処理も改善
-                                                    event_text = ul.get_text(strip=True)
-                                                    # 日付パターンと時間表記を除去
-                                                    event_text = re.sub(pattern, "", event_text)
-                                                    event_text = re.sub(time_pattern, "", event_text)
-                                                    # 空の括弧を削除
-                                                    event_text = re.sub(r'\(\s*\)', "", event_text)
-                                                    
-                                                    event_text = re.sub(r'[\s　]+', ' ', event_text).strip()
-                                                    
-                                                    if len(event_text) < 5:
-                                                        event_text = "イベント情報"
-                                                        
-                                                    formatted_date = format_event_date(start_date, end_date, date_text)
-                                                    formatted_event = f"{event_text} ({formatted_date})"
-                                                    
-                                                    if formatted_event not in current_events:
-                                                        current_events.append(formatted_event)
-                            except Exception as e:
-                                logger.warning(f"フォールバック処理中にエラー: {e}")
-                                continue
-        
-        logger.info(f"最終的に取得した現在開催中のイベント数: {len(current_events)}")
-        return current_events
-        
+            logger.debug("日付パターン発見: %s", date_range.text)
+
+            event_name = event_names.get(text, clean_event_name, text)
+            items.append(make_candidate(event_name, date_range))
+            continue
+
+        # ulタグの中を直接探してみる
+        if len(text) <= 20:  # 十分な長さがあるか
+            continue
+        if deadline.expired():
+            logger.warning("解析の時間予算を使い切ったため、フォールバック候補の抽出を打ち切ります。")
+            truncated = True
+            break
+
+        date_ranges = list(iter_date_ranges(text))
+        if not date_ranges:
+            continue
+
+        event_text = fallback_names.get(text, clean_fallback_name, text)
+        for date_range in date_ranges:
+            logger.debug("ul内で日付パターン発見: %s", date_range.text)
+            fallback.append(make_candidate(event_text, date_range))
+
+    logger.info(f"{item_count}個のリスト項目を確認しました。")
+    metrics.incr("items_scanned", item_count)
+    metrics.incr("date_matches", len(items) + len(fallback))
+    return {"items": items, "fallback": fallback, "truncated": truncated}
+
+def parse_events(html, deadline=None, section_ids=None):
+    """HTMLから日付付きのイベント候補をすべて抽出する。
+
+    現在日時による絞り込みは EventSchedule (EventSchedule.from_parsed) で行うので、
+    結果はページ内容が変わらない限りキャッシュして再利用できる。
+    section_ids を省略した場合は EVENT_SECTION_IDS の領域を先に解析する。
+    """
+    section_ids = EVENT_SECTION_IDS if section_ids is None else section_ids
+
+    # デバッグ用：HTMLを保存 (DEBUG_HTML_SAMPLE_RATE の割合の実行でだけ保存する)
+    if DEBUG_HTML_SAMPLE_RATE > 0 and random.random() < DEBUG_HTML_SAMPLE_RATE:
+        with open(DEBUG_HTML_PATH, "w", encoding="utf-8") as f:
+            f.write(html)
+        logger.info(f"デバッグ用にHTMLを保存しました: {DEBUG_HTML_PATH}")
+
+    # まずイベント情報の領域だけを解析し、何も見つからなければページ全体を解析する
+    if section_ids:
+        with metrics.span("parse"):
+            document = parse_html(html, section_ids=section_ids)
+        with metrics.span("extract"):
+            parsed = extract_events(document, deadline)
+        if parsed["items"] or parsed["fallback"] or parsed["truncated"]:
+            return parsed
+        logger.warning("対象領域からイベントが見つかりませんでした。ページ全体を解析します。")
+
+    with metrics.span("parse"):
+        document = parse_html(html)
+    with metrics.span("extract"):
+        return extract_events(document, deadline)
+
+def _cache_key(url, section_ids):
+    """解析結果のキャッシュのキー (同じURLでも解析する領域が違えば別の結果になる)"""
+    section_ids = EVENT_SECTION_IDS if section_ids is None else section_ids
+    return f"{url}#sections={','.join(section_ids)}"
+
+def fetch_event_schedule(deadline=None, source=None):
+    """取得元 (デフォルトは WIKI_URL) のページを取得・解析して、
+    任意の時刻で問い合わせられる EventSchedule を返す。
+
+    締め切りまでにページを取得できなかった場合は DeadlineExceeded を送出する。
+    """
+    deadline = deadline or Deadline()
+    url = source.url if source is not None else WIKI_URL
+    section_ids = source.section_ids if source is not None else None
+    cache_key = _cache_key(url, section_ids)
+
+    try:
+        logger.info(f"URLにリクエスト送信中: {url}")
+        # コールドスタート時は、通信を待つ間にHTMLパーサーを読み込んでおく
+        preload()
+        fetch_deadline = deadline.reserve(PARSE_RESERVE + DELIVERY_RESERVE)
+        try:
+            # 同じホストへの同時接続数とリクエスト間隔を制限する
+            with metrics.span("fetch"), hosts.slot(url, fetch_deadline) as session:
+                result = fetch_cache.fetch(
+                    url, headers=HEADERS, timeout=fetch_deadline.timeout(FETCH_TIMEOUT),
+                    session=session, deadline=fetch_deadline, key=cache_key,
+                )
+        except requests.Timeout as e:
+            if fetch_deadline.expired():
+                raise DeadlineExceeded(f"ページの取得が時間予算内に完了しませんでした: {e}") from e
+            raise
+        metrics.incr("bytes_downloaded", result.size)
+        metrics.incr("cache_hits", int(result.from_cache))
+
+        if result.from_cache:
+            parsed = result.parsed
+        else:
+            logger.info(f"ページの取得に成功しました。HTMLの解析を開始します: {url}")
+            parsed = parse_events(result.text, deadline.reserve(DELIVERY_RESERVE), section_ids)
+            if parsed["truncated"]:
+                # 途中までの結果はキャッシュしない
+                logger.warning("解析を途中で打ち切ったため、見つかったイベントのみを通知します。")
+            else:
+                fetch_cache.store(cache_key, result, parsed)
+
+        return EventSchedule.from_parsed(parsed)
+
+    except DeadlineExceeded as e:
+        logger.error(f"時間予算を超過しました: {e}")
+        raise
     except requests.RequestException as e:
         logger.error(f"リクエスト中にエラーが発生しました: {e}")
         raise
@@ -358,33 +289,182 @@ def fetch_current_events():
         logger.error(f"予期せぬエラーが発生しました: {e}")
         raise
 
+def fetch_current_events(today=None, deadline=None):
+    """today (デフォルトは現在の日本時間) の時点で開催中のイベントのリストを返す"""
+    schedule = fetch_event_schedule(deadline)
+    today = today or now_jst()
+    logger.info(f"現在の日付: {today.strftime('%Y/%m/%d')}")
+    current_events = schedule.active_at(today)
+    logger.info(f"最終的に取得した現在開催中のイベント数: {len(current_events)}")
+    return current_events
+
+def load_cached_schedule(source=None):
+    """前回取得した解析結果から EventSchedule を作る (キャッシュがなければ None)"""
+    if source is None:
+        parsed = fetch_cache.last_parsed(_cache_key(WIKI_URL, None))
+    else:
+        parsed = fetch_cache.last_parsed(_cache_key(source.url, source.section_ids))
+    if parsed is None:
+        return None
+    return EventSchedule.from_parsed(parsed)
+
+class SourceResult:
+    """取得元ごとの取得結果"""
+
+    def __init__(self, source, schedule=None, degraded=False, error=None):
+        self.source = source
+        self.schedule = schedule
+        self.degraded = degraded  # 時間内に取得できず、前回の解析結果を使っている
+        self.error = error
+
+def fetch_source(source, deadline):
+    try:
+        return SourceResult(source, fetch_event_schedule(deadline, source))
+    except DeadlineExceeded:
+        # 前回取得した情報で代わりに通知する
+        return SourceResult(source, load_cached_schedule(source), degraded=True)
+    except Exception as e:
+        return SourceResult(source, error=e)
+
+def fetch_sources(sources, deadline, executor):
+    """取得元を並行して取得・解析する (購読している通知先の数によらず、取得元ごとに1回だけ)"""
+    futures = [executor.submit(fetch_source, source, deadline) for source in sources]
+    return {source.name: future.result() for source, future in zip(sources, futures)}
+
+def build_notification(schedule, now, store=None, degraded=False, note=None):
+    """送信するメッセージを組み立てる (差分通知で変更がなければ空のリスト)。
+
+    note を渡すと、最初のメッセージの見出しの次の行に付け加える。
+    """
+    def payloads(header, lines):
+        return build_payloads(header if note is None else f"{header}\n{note}", lines)
+
+    if degraded:
+        # 取得が間に合わなかった場合は、前回の情報をそのまま知らせる
+        if schedule is None:
+            return payloads("⚠️ wikiの取得が時間内に完了せず、イベント情報を取得できませんでした。", [])
+        return payloads(
+            "⚠️ wikiの取得が時間内に完了しなかったため、前回取得した開催中のイベント情報をお知らせします: ",
+            (event.formatted for event in schedule.active_at(now)),
+        )
+
+    if store is not None:
+        diff = store.diff(schedule, now)
+        if not diff:
+            logger.info("前回の通知から変更はありません。")
+            return []
+        logger.info(f"差分: 新規{len(diff.new)}件, 変更{len(diff.changed)}件, まもなく終了{len(diff.ending_soon)}件")
+        return payloads("📢 イベント情報の更新: ", diff.lines())
+
+    events = schedule.active_at(now)
+    if not events:
+        logger.info("開催中のイベントはありません。")
+        return payloads("現在、開催中のイベントはありません。", [])
+    return payloads("📢 開催中のイベント情報: ", (event.formatted for event in events))
+
+def notify_mode(target):
+    """通知先の通知モード (diff / full)"""
+    return target.mode or NOTIFY_MODE
+
+def notify_target(target, results, now, deadline):
+    """通知先1つ分のメッセージを組み立てて送信し、送信したメッセージ数を返す"""
+    failed = [result.source.name for result in results if result.error is not None]
+    if failed and len(failed) == len(results):
+        raise Exception(f"取得元 {', '.join(failed)} の取得に失敗したため、通知を中止します。")
+    # 一部の取得元だけ失敗した場合は、取得できた取得元のイベントを送り、失敗したことを書き添える
+    note = None
+    if failed:
+        logger.warning(f"{target.name}: 取得元 {', '.join(failed)} を除いて通知します。")
+        note = f"⚠️ 取得元 {', '.join(failed)} の取得に失敗したため、そのイベントは含まれていません。"
+    results = [result for result in results if result.error is None]
+
+    degraded = any(result.degraded for result in results)
+    schedules = [result.schedule for result in results if result.schedule is not None]
+    schedule = ScheduleGroup(schedules, target.matches) if schedules else None
+
+    # 差分通知モードでは前回までに通知した内容と比較する (状態は通知先ごとに保存する)
+    store = EventStateStore(default_backend(target.name)) if notify_mode(target) == "diff" and not degraded else None
+    with metrics.span("format"):
+        payloads = build_notification(schedule, now, store, degraded, note)
+    if not payloads:
+        logger.info(f"通知する内容がないため、{target.name} への送信をスキップします。")
+        return 0
+
+    if not target.webhook_url:
+        logger.error(f"{target.name} のWebhook URLが設定されていません。")
+        raise Exception("WEBHOOK_URLが環境変数に設定されていないか、コードで直接指定されていません。")
+
+    logger.info(f"{target.name} のWebhookに{len(payloads)}件のメッセージを送信します。")
+    with metrics.span("deliver"):
+        get_client().deliver(target.webhook_url, payloads, deadline)
+    logger.info(f"{target.name} のWebhookへの通知に成功しました。")
+
+    # 通知に成功してから状態を保存する (失敗した場合は次回再送される)
+    if store is not None:
+        store.commit(schedule.active_at(now), now)
+    return len(payloads)
+
+def notify_targets(registry, results, now, deadline, executor, targets=None):
+    """通知先 (省略時はすべて) に並行して送信し、失敗した通知先の名前とエラーの辞書を返す"""
+    futures = [
+        (target, executor.submit(
+            notify_target, target,
+            [results[source.name] for source in registry.sources_for(target)], now, deadline,
+        ))
+        for target in (registry.targets if targets is None else targets)
+    ]
+    failed = {}
+    for target, future in futures:
+        try:
+            metrics.incr("messages_sent", future.result())
+        except Exception as e:
+            logger.error(f"{target.name} への通知中にエラーが発生しました: {e}")
+            failed[target.name] = e
+    return failed
+
 def lambda_handler(event, context):
-    return main()
+    return main(Deadline.from_context(context))
 
-def main():
+def main(deadline=None, now=None, registry=None):
+    deadline = deadline or Deadline()
+    metrics.reset()
     try:
-        events = fetch_current_events()
-        if not events:
-            content = "現在、開催中のイベントはありません。"
-            logger.info("開催中のイベントはありません。")
-        else:
-            content = "📢 開催中のイベント情報: \n" + "\n".join(events)
-            logger.info(f"Webhookに{len(events)}件のイベント情報を送信します。")
-
-        if not WEBHOOK_URL:
-            logger.error("WEBHOOK_URLが設定されていません。")
-            raise Exception("WEBHOOK_URLが環境変数に設定されていないか、コードで直接指定されていません。")
-            
-        response = requests.post(WEBHOOK_URL, json={"content": content})
-        if response.status_code != 204:
-            logger.error(f"通知に失敗しました。ステータスコード: {response.status_code}, レスポンス: {response.text}")
-            raise Exception(f"通知に失敗しました。ステータスコード: {response.status_code}, レスポンス: {response.text}")
-        else:
-            logger.info("Webhookへの通知に成功しました。")
-            
+        # wiki の日時は日本時間なので、Lambda (UTC) でも日本時間で判定する
+        now = now or now_jst()
+        logger.info(f"現在の日時: {now.strftime('%Y/%m/%d %H:%M')}")
+        registry = registry or load_registry(WIKI_URL, WEBHOOK_URL)
+        sources = registry.subscribed_sources()
+        metrics.incr("sources", len(sources))
+
+        # 取得元の取得・解析と通知先への送信をそれぞれ並行して行う
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            results = fetch_sources(sources, deadline, executor)
+            for result in results.values():
+                if result.schedule is not None:
+                    metrics.incr("events", len(result.schedule.active_at(now)))
+            metrics.set_property("degraded", any(result.degraded for result in results.values()))
+
+            errors = [f"{name}: {result.error}" for name, result in results.items() if result.error is not None]
+            failed = notify_targets(registry, results, now, deadline, executor)
+            errors.extend(f"{name}: {error}" for name, error in failed.items())
+
+        if errors:
+            # 実運用では、ここでエラー通知を送信するか、リトライロジックを実装するとよい
+            metrics.set_property("error", "; ".join(errors))
+
     except Exception as e:
         logger.error(f"メイン処理中にエラーが発生しました: {e}")
-        # 実運用では、ここでエラー通知を送信するか、リトライロジックを実装するとよい
+        metrics.set_property("error", str(e))
+    finally:
+        # 1回の実行につき1行の集計レコードを出力する
+        metrics.emit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="開催中のイベント情報をDiscordに通知する")
+    parser.add_argument("--deadline", type=float, help="Lambda の残り実行時間を模擬する (秒)")
+    parser.add_argument("--now", type=parse_time, help="現在日時を指定する (ISO形式、タイムゾーンがなければ日本時間)")
+    parser.add_argument("--config", help="取得元と通知先の設定 (JSONファイル、未指定なら NOTIFY_CONFIG)")
+    args = parser.parse_args()
+    main(Deadline(args.deadline), args.now, load_registry(WIKI_URL, WEBHOOK_URL, args.config))
\ No newline at end of file
@@ -0,0 +1,334 @@
+"""常駐して取得・通知を定期的に行い、解析済みのイベントをHTTPで提供する
+
+    python lambda/service.py [--host 127.0.0.1] [--port 8080] [--config notify.json] [--no-notify]
+                             [--interval 600] [--notify-interval 86400]
+
+取得元を SERVICE_INTERVAL 秒ごと (前後に SERVICE_JITTER の割合だけずらす) に取得・解析し、
+結果をメモリに保持する。取得に失敗した場合は SERVICE_RETRY 秒から倍々に間隔を延ばして
+再試行し (最大で SERVICE_INTERVAL)、その間は前回取得できたイベントを返し続ける。
+--no-notify を付けなければ、Lambda と同じように各通知先へ送信する。差分通知 (diff) の通知先には
+取得のたびに変更だけを送り、全件通知 (full) の通知先には SERVICE_NOTIFY_INTERVAL 秒ごとに
+開催中のイベントを送る。送信に失敗した通知先には次の取得の後に改めて送る (取得の間隔には影響しない)。
+
+    GET /events               すべてのイベント
+    GET /events/active        開催中のイベント (?at=ISO形式の日時、省略時は現在)
+    GET /events/ending-soon   hours 時間以内に終了するイベント (?hours=24&at=...)
+
+レスポンスには内容から計算した ETag を付け、If-None-Match が一致すれば 304 を返す。
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from deadline import Deadline
+from event_model import now_jst, parse_time
+from event_state import ENDING_SOON_HOURS
+from instrumentation import metrics
+from registry import load_registry
+from send_discord_notification import (
+    MAX_WORKERS, WEBHOOK_URL, WIKI_URL, fetch_sources, notify_mode, notify_targets,
+)
+
+logger = logging.getLogger(__name__)
+
+# 取得の間隔 (秒) と、間隔をずらす割合 (複数の常駐プロセスが同時に取得しないように)
+SERVICE_INTERVAL = float(os.environ.get("SERVICE_INTERVAL", "600"))
+SERVICE_JITTER = float(os.environ.get("SERVICE_JITTER", "0.1"))
+# 取得に失敗したときの最初の再試行までの間隔 (秒)
+SERVICE_RETRY = float(os.environ.get("SERVICE_RETRY", "30"))
+# 全件通知 (mode が full) の通知先に送る間隔 (秒)
+SERVICE_NOTIFY_INTERVAL = float(os.environ.get("SERVICE_NOTIFY_INTERVAL", "86400"))
+
+# /events/ending-soon の hours に指定できる上限 (1年)
+MAX_QUERY_HOURS = 24 * 366
+
+
+class SourceState:
+    """取得元ごとの最新の解析結果"""
+
+    def __init__(self, schedule=None, refreshed_at=None, error=None):
+        self.schedule = schedule
+        self.refreshed_at = refreshed_at  # schedule を取得した日時
+        self.error = error  # 直近の取得が失敗した場合のエラー
+
+
+class EventCache:
+    """取得元ごとの EventSchedule をメモリに保持する。
+
+    更新は取得スレッドだけが行い、辞書ごと差し替えるので、
+    HTTPのリクエストを処理するスレッドはロックなしで読める。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sources = {}
+        self.refreshed_at = None
+
+    def update(self, results, now):
+        """取得結果を反映する (取得に失敗した取得元は前回の解析結果を残す)"""
+        with self.lock:
+            sources = dict(self.sources)
+            for name, result in results.items():
+                previous = sources.get(name) or SourceState()
+                if result.schedule is not None:
+                    sources[name] = SourceState(result.schedule, now, result.error)
+                else:
+                    sources[name] = SourceState(previous.schedule, previous.refreshed_at, result.error)
+            self.sources = sources
+            self.refreshed_at = now
+
+    def ready(self):
+        return any(state.schedule is not None for state in self.sources.values())
+
+    def query(self, select):
+        """取得元ごとに select(schedule) で選んだイベントを、取得元の名前を付けて返す"""
+        events = []
+        stale = []
+        for name, state in self.sources.items():
+            if state.error is not None:
+                stale.append(name)
+            if state.schedule is None:
+                continue
+            for event in select(state.schedule):
+                events.append({
+                    "source": name,
+                    "name": event.name,
+                    "start": event.start.isoformat(),
+                    "end": event.end.isoformat(),
+                    "formatted": event.formatted,
+                })
+        # stale: 直近の取得に失敗し、前回の解析結果を返している取得元
+        return {"events": events, "stale": stale}
+
+
+class Refresher(threading.Thread):
+    """取得元を定期的に取得・解析し、EventCache を更新して通知先に送信する"""
+
+    def __init__(self, registry, cache, notify=True, interval=SERVICE_INTERVAL,
+                 jitter=SERVICE_JITTER, retry=SERVICE_RETRY, notify_interval=SERVICE_NOTIFY_INTERVAL):
+        super().__init__(name="refresher", daemon=True)
+        self.registry = registry
+        self.cache = cache
+        self.notify = notify
+        self.interval = interval
+        self.jitter = jitter
+        self.retry = retry
+        self.notify_interval = notify_interval
+        self.notified_at = {}  # 全件通知の通知先ごとの、最後に送信に成功した時刻 (time.monotonic)
+        self.stopped = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+    def refresh(self):
+        """1回分の取得・通知を行い、取得がすべて成功したかを返す (通知の失敗は含めない)"""
+        metrics.reset()
+        errors = []
+        fetched = False
+        try:
+            now = now_jst()
+            # 常駐プロセスには実行時間の制限がないので、締め切りはリクエストのタイムアウトだけ
+            results = fetch_sources(list(self.registry.sources.values()), Deadline(), self.executor)
+            self.cache.update(results, now)
+            for result in results.values():
+                if result.error is not None:
+                    logger.error(f"{result.source.name} の取得に失敗しました: {result.error}")
+                    errors.append(f"{result.source.name}: {result.error}")
+                elif result.schedule is not None:
+                    metrics.incr("events", len(result.schedule.active_at(now)))
+            fetched = not errors
+            if self.notify:
+                errors.extend(self.send(results, now))
+        except Exception as e:
+            logger.error(f"定期取得中にエラーが発生しました: {e}")
+            errors.append(str(e))
+        finally:
+            if errors:
+                metrics.set_property("error", "; ".join(errors))
+            metrics.emit()
+        return fetched
+
+    def due_targets(self, clock):
+        """今回送信する通知先 (差分通知はすべて、全件通知は前回の送信から notify_interval 経ったもの)"""
+        return [
+            target for target in self.registry.targets
+            if notify_mode(target) != "full"
+            or target.name not in self.notified_at
+            or clock - self.notified_at[target.name] >= self.notify_interval
+        ]
+
+    def send(self, results, now):
+        """送信する時期の通知先に送信し、失敗した通知先のエラーのリストを返す"""
+        clock = time.monotonic()
+        targets = self.due_targets(clock)
+        if not targets:
+            return []
+        failed = notify_targets(self.registry, results, now, Deadline(), self.executor, targets)
+        for target in targets:
+            if target.name not in failed and notify_mode(target) == "full":
+                self.notified_at[target.name] = clock
+        return [f"{name}: {error}" for name, error in failed.items()]
+
+    def next_delay(self, failures):
+        """次の取得までの秒数 (失敗が続いた場合は指数バックオフ)"""
+        delay = self.interval if failures == 0 else min(self.interval, self.retry * 2 ** (failures - 1))
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def run(self):
+        failures = 0
+        while not self.stopped.is_set():
+            failures = 0 if self.refresh() else failures + 1
+            delay = self.next_delay(failures)
+            if failures:
+                logger.warning(f"{failures}回続けて取得に失敗しました。{delay:.0f}秒後に再試行します。")
+            self.stopped.wait(delay)
+
+    def stop(self):
+        self.stopped.set()
+        self.executor.shutdown(wait=False)
+
+
+def _etag_matches(header, etag):
+    if header is None:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    # 弱い比較 (W/ の有無は問わない)
+    return "*" in candidates or etag in [value.removeprefix("W/") for value in candidates]
+
+
+def _select_all(query):
+    return lambda schedule: schedule.events()
+
+
+def _select_active(query):
+    at = _query_time(query)
+    return lambda schedule: schedule.active_at(at)
+
+
+def _select_ending_soon(query):
+    at = _query_time(query)
+    try:
+        hours = float(query.get("hours", [ENDING_SOON_HOURS])[0])
+    except ValueError:
+        hours = math.nan
+    # nan や inf、大きすぎる値は timedelta にできない
+    if not (math.isfinite(hours) and 0 <= hours <= MAX_QUERY_HOURS):
+        raise ValueError(f"hours には0〜{MAX_QUERY_HOURS}の数を指定してください")
+    return lambda schedule: schedule.ending_within(at, hours)
+
+
+def _query_time(query):
+    if "at" not in query:
+        return now_jst()
+    try:
+        return parse_time(query["at"][0])
+    except ValueError:
+        raise ValueError("at にはISO形式の日時を指定してください")
+
+
+ROUTES = {
+    "/events": _select_all,
+    "/events/active": _select_active,
+    "/events/ending-soon": _select_ending_soon,
+}
+
+
+class EventsHandler(BaseHTTPRequestHandler):
+    server_version = "WikiReminderBot"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        route = ROUTES.get(url.path.rstrip("/") or "/")
+        if route is None:
+            self.send_json(404, {"error": "not found"})
+            return
+        cache = self.server.cache
+        try:
+            select = route(parse_qs(url.query))
+            if not cache.ready():
+                self.send_json(503, {"error": "イベント情報をまだ取得していません"})
+                return
+            body = cache.query(select)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except OverflowError:
+            # datetime.max に近い at など、期間の計算が日時の範囲を超える場合
+            self.send_json(400, {"error": "指定された日時と期間では検索できません"})
+            return
+        self.send_json(200, body)
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        etag = f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+        refreshed_at = self.server.cache.refreshed_at
+        if status == 200 and _etag_matches(self.headers.get("If-None-Match"), etag):
+            status, data = 304, b""
+
+        self.send_response(status)
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            if refreshed_at is not None:
+                self.send_header("X-Refreshed-At", refreshed_at.isoformat())
+        if data:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+class EventsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cache):
+        super().__init__(address, EventsHandler)
+        self.cache = cache
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=8080, help="待ち受けるポート")
+    parser.add_argument("--config", help="取得元と通知先の設定 (JSONファイル、未指定なら NOTIFY_CONFIG)")
+    parser.add_argument("--interval", type=float, default=SERVICE_INTERVAL, help="取得の間隔 (秒)")
+    parser.add_argument("--notify-interval", type=float, default=SERVICE_NOTIFY_INTERVAL,
+                        help="全件通知の通知先に送る間隔 (秒)")
+    parser.add_argument("--no-notify", action="store_true", help="Discord には送信せず、イベント情報の提供だけを行う")
+    args = parser.parse_args()
+
+    cache = EventCache()
+    refresher = Refresher(
+        load_registry(WIKI_URL, WEBHOOK_URL, args.config), cache,
+        notify=not args.no_notify, interval=args.interval, notify_interval=args.notify_interval,
+    )
+    server = EventsServer((args.host, args.port), cache)
+    # SIGTERM でも Ctrl+C と同じように終了する (shutdown は serve_forever と別のスレッドから呼ぶ)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+
+    refresher.start()
+    logger.info(f"http://{args.host}:{server.server_address[1]}/events で待ち受けます (取得間隔: {args.interval:.0f}秒)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        refresher.stop()
+        server.server_close()
+        logger.info("終了しました。")
+
+
+if __name__ == "__main__":
+    main()
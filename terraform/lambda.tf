@@ -20,6 +20,31 @@ resource "aws_iam_role_policy_attachment" "lambda_basic" {
   policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
 }
 
+resource "aws_s3_bucket" "event_state" {
+  bucket_prefix = "wiki-reminder-state-"
+}
+
+resource "aws_iam_role_policy" "lambda_event_state" {
+  name = "lambda-event-state-policy"
+  role = aws_iam_role.lambda-basic-exec.id
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect   = "Allow",
+        Action   = ["s3:GetObject", "s3:PutObject"],
+        Resource = "${aws_s3_bucket.event_state.arn}/*"
+      },
+      {
+        Effect   = "Allow",
+        Action   = "s3:ListBucket",
+        Resource = aws_s3_bucket.event_state.arn
+      }
+    ]
+  })
+}
+
 resource "aws_lambda_function" "wiki_reminder_tf" {
   function_name = "wiki-reminder-tf"
   handler       = "send_discord_notification.lambda_handler"
@@ -34,7 +59,8 @@ resource "aws_lambda_function" "wiki_reminder_tf" {
 
   environment {
     variables = {
-      WEBHOOK_URL = var.WEBHOOK_URL
+      WEBHOOK_URL        = var.WEBHOOK_URL
+      EVENT_STATE_S3_URI = "s3://${aws_s3_bucket.event_state.bucket}/event_state.json"
     }
   }
 }
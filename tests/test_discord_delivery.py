@@ -0,0 +1,109 @@
+"""Webhook送信 (メッセージの分割・レート制限・締め切り) のテスト
+
+ローカルの代替サーバー (tools/fake_discord_webhook.py) に実際に送信する。
+
+    python -m pytest tests
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "lambda"))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from deadline import Deadline, DeadlineExceeded  # noqa: E402
+from discord_delivery import (  # noqa: E402
+    EMBED_TOTAL_LIMIT, EMBEDS_PER_MESSAGE, DiscordWebhookClient, build_payloads,
+)
+from fake_discord_webhook import FakeWebhookServer, validate  # noqa: E402
+
+
+@pytest.fixture
+def webhook():
+    """window 秒あたり limit 件までのローカルの代替サーバーを起動する"""
+    servers = []
+
+    def start(limit=2, window=0.5):
+        server = FakeWebhookServer(("127.0.0.1", 0), limit=limit, window=window, verbose=False)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}/webhook"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _lines(payloads):
+    return [
+        line
+        for payload in payloads
+        for embed in payload.get("embeds", [])
+        for line in embed["description"].split("\n")
+    ]
+
+
+@pytest.mark.parametrize("sizes", [[700] * 40, [4000, 10] * 12, [9000, 5, 6000]])
+def test_payloads_fit_discord_limits(sizes):
+    lines = [f"{index:03d}" + "x" * (size - 3) for index, size in enumerate(sizes)]
+    payloads = build_payloads("📢 ヘッダー", iter(lines))
+
+    assert len(payloads) > 1
+    assert payloads[0]["content"] == "📢 ヘッダー"
+    assert all("content" not in payload for payload in payloads[1:])
+    for payload in payloads:
+        assert validate(payload) is None
+        assert len(payload["embeds"]) <= EMBEDS_PER_MESSAGE
+        assert sum(len(embed["description"]) for embed in payload["embeds"]) <= EMBED_TOTAL_LIMIT
+    # 長すぎる行は分割されるが、連結すれば元の順番の行に戻る
+    assert "".join(_lines(payloads)) == "".join(lines)
+
+
+def test_header_only_without_lines():
+    assert build_payloads("現在、開催中のイベントはありません。", iter([])) == [
+        {"content": "現在、開催中のイベントはありません。"}
+    ]
+
+
+def test_deliver_waits_for_rate_limit(webhook):
+    server, url = webhook(limit=2, window=0.5)
+    payloads = build_payloads("ヘッダー", [f"イベント{index}" + "x" * 2900 for index in range(10)])
+    assert len(payloads) == 5
+
+    start = time.monotonic()
+    DiscordWebhookClient().deliver(url, payloads, Deadline(10))
+
+    assert server.messages == payloads
+    # 2件ずつしか送れないので、少なくとも2回はリセットを待つ
+    assert time.monotonic() - start >= 0.9
+
+
+def test_retries_after_429(webhook, caplog):
+    server, url = webhook(limit=1, window=0.5)
+    # 別のクライアントが枠を使い切った状態にしておく (このクライアントは残り回数を知らない)
+    server.take()
+
+    with caplog.at_level(logging.WARNING, logger="discord_delivery"):
+        DiscordWebhookClient().send(url, {"content": "再送"}, Deadline(10))
+
+    assert server.messages == [{"content": "再送"}]
+    assert any("レート制限されました" in record.message for record in caplog.records)
+
+
+def test_gives_up_at_deadline(webhook):
+    server, url = webhook(limit=1, window=5.0)
+    server.take()
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        DiscordWebhookClient().send(url, {"content": "間に合わない"}, Deadline(0.5))
+
+    # Retry-After (約5秒) を待たずに諦める
+    assert time.monotonic() - start < 2
+    assert server.messages == []
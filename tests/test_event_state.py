@@ -0,0 +1,60 @@
+"""差分通知の状態 (EventStateStore) のテスト
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+
+from event_model import Event, EventSchedule, parse_time  # noqa: E402
+from event_state import EventStateStore, JsonFileStateBackend, event_keys  # noqa: E402
+
+
+def _event(end, order):
+    # 名前と開始日が同じで、終了日だけが違うイベント
+    return Event(
+        "ピックアップ募集", parse_time("2026-10-15T11:00"), parse_time(end),
+        f"ピックアップ募集 (2026/10/15 11:00 ~ {end[:10].replace('-', '/')} 10:59)", order,
+    )
+
+
+FIRST = _event("2026-10-22T10:59", 0)
+SECOND = _event("2026-10-29T10:59", 1)
+
+
+def _run(path, events, now):
+    """1回分の実行 (差分を求めて、通知したものとして記録する)"""
+    store = EventStateStore(JsonFileStateBackend(path))
+    schedule = EventSchedule(events)
+    now = parse_time(now)
+    diff = store.diff(schedule, now)
+    store.commit(schedule.active_at(now), now)
+    return diff
+
+
+def test_same_name_and_start_get_distinct_keys():
+    keys = event_keys([FIRST, SECOND])
+    assert len(set(keys)) == 2
+
+
+def test_duplicates_are_not_reported_as_changed(tmp_path):
+    path = str(tmp_path / "state.json")
+    first = _run(path, [FIRST, SECOND], "2026-10-16T09:00")
+    assert first.new == [FIRST, SECOND]
+
+    for now in ("2026-10-17T09:00", "2026-10-18T09:00"):
+        assert not _run(path, [FIRST, SECOND], now)
+
+
+def test_keys_survive_duplicates_appearing_and_disappearing(tmp_path):
+    path = str(tmp_path / "state.json")
+    _run(path, [FIRST], "2026-10-16T09:00")
+
+    # 同名・同日のイベントが増えても、記録済みのイベントは新規にならない
+    diff = _run(path, [FIRST, SECOND], "2026-10-17T09:00")
+    assert diff.new == [SECOND] and not diff.changed
+
+    # 片方が終わって1件に戻っても、残ったイベントは新規・変更にならない
+    diff = _run(path, [FIRST, SECOND], "2026-10-23T09:00")
+    assert not diff.new and not diff.changed
@@ -0,0 +1,75 @@
+"""ページ取得 (本文の受信と締め切り) のテスト
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+
+import send_discord_notification as bot  # noqa: E402
+from deadline import Deadline, DeadlineExceeded  # noqa: E402
+from fetch_cache import FetchCache, FileCacheBackend  # noqa: E402
+from host_pool import HostPool  # noqa: E402
+from registry import Source  # noqa: E402
+
+
+class _StallingHandler(BaseHTTPRequestHandler):
+    """ヘッダーと本文の先頭100バイトだけを送って止まる"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "100000")
+        self.end_headers()
+        self.wfile.write(b"a" * 100)
+        self.wfile.flush()
+        self.server.release.wait(10)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stalling_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StallingHandler)
+    server.daemon_threads = True
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FetchCache(FileCacheBackend(str(tmp_path)), parser_version=bot.PARSER_VERSION)
+
+
+def test_stalled_body_exceeds_deadline(stalling_url, cache):
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        cache.fetch(stalling_url, timeout=0.5, deadline=Deadline(0.5))
+    assert time.monotonic() - start < 2
+
+
+def test_stalled_body_without_deadline_is_a_timeout(stalling_url, cache):
+    with pytest.raises(requests.Timeout):
+        cache.fetch(stalling_url, timeout=0.5, deadline=Deadline(30))
+
+
+def test_stalled_source_is_degraded(stalling_url, cache, monkeypatch):
+    monkeypatch.setattr(bot, "hosts", HostPool(min_interval=0))
+    monkeypatch.setattr(bot, "fetch_cache", cache)
+    # 取得に使えるのは、解析と通知の分を残した 1 秒だけ
+    deadline = Deadline(bot.PARSE_RESERVE + bot.DELIVERY_RESERVE + 1)
+
+    result = bot.fetch_source(Source("default", stalling_url), deadline)
+
+    assert result.degraded and result.error is None
@@ -0,0 +1,30 @@
+"""HTMLパーサーごとのテキスト抽出の一致を確認する
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+
+from html_backend import parse_html  # noqa: E402
+
+PAGE = """
+<html><head><script>head()</script></head><body><div id="body"><ul>
+<li>親<b>太字</b><script>var x=1</script><style>.a{color:red}</style>子<!-- c -->テキスト後
+<ul><li>子 (2026/10/2 ～ <i>10/3</i>)<script>y()</script></li></ul></li>
+</ul></div><script>tail()</script></body></html>
+"""
+
+
+@pytest.mark.parametrize("section_ids", [["body"], None])
+def test_backends_skip_script_and_style(section_ids):
+    results = {}
+    for backend in ("selectolax", "lxml", "html.parser"):
+        pytest.importorskip({"selectolax": "selectolax", "lxml": "lxml"}.get(backend, "bs4"))
+        results[backend] = list(parse_html(PAGE, backend=backend, section_ids=section_ids).iter_blocks(("li", "ul")))
+
+    assert results["selectolax"][1] == ("li", "親太字子テキスト後子 (2026/10/2 ～10/3)")
+    assert results["selectolax"] == results["lxml"] == results["html.parser"]
@@ -0,0 +1,55 @@
+"""年をまたぐ開催期間の回帰テスト
+
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+
+from date_extractor import find_date_range  # noqa: E402
+from event_model import Event, EventIndex, EventSchedule, parse_time  # noqa: E402
+from html_backend import parse_html  # noqa: E402
+from send_discord_notification import extract_events, format_event_date  # noqa: E402
+
+NEW_YEAR_PAGE = """
+<div id="body"><ul>
+<li>年末年始キャンペーン (2025/12/25 11:00 ～ 1/5 3:59)</li>
+<li>年末特別任務 開催中 (2025/12/20 11:00 ～ 12/31 23:59)</li>
+</ul></div>
+"""
+
+
+def test_end_date_rolls_over_to_next_year():
+    date_range = find_date_range("年末年始キャンペーン (2025/12/25 11:00 ～ 1/5 3:59)")
+    assert date_range.start == datetime(2025, 12, 25, 11, 0)
+    assert date_range.end == datetime(2026, 1, 5, 3, 59)
+
+
+def test_explicit_end_year_is_kept():
+    date_range = find_date_range("復刻イベント (2025/12/25 11:00 ～ 2026/1/5 3:59)")
+    assert date_range.end == datetime(2026, 1, 5, 3, 59)
+    assert format_event_date(date_range) == "2025/12/25 11:00 ~ 2026/01/05 3:59"
+
+
+def test_schedule_with_new_year_range():
+    parsed = extract_events(parse_html(NEW_YEAR_PAGE))
+    assert parsed["items"][0]["formatted"] == "年末年始キャンペーン (2025/12/25 11:00 ~ 2026/01/05 3:59)"
+    assert parsed["items"][1]["formatted"] == "年末特別任務 開催中 (2025/12/20 11:00 ~ 2025/12/31 23:59)"
+    schedule = EventSchedule.from_parsed(parsed)
+
+    active = schedule.active_at(parse_time("2026-01-02T12:00"))
+    assert [event.name for event in active] == ["年末年始キャンペーン"]
+    ending = schedule.ending_within(parse_time("2026-01-04T12:00"), 24)
+    assert [event.name for event in ending] == ["年末年始キャンペーン"]
+
+
+def test_index_skips_inverted_ranges():
+    # 以前のキャッシュに残っている、終了が開始より前のイベント
+    inverted = Event("逆転", parse_time("2025-12-25T11:00"), parse_time("2025-01-05T03:59"), "逆転")
+    normal = Event("通常", parse_time("2025-12-20T11:00"), parse_time("2025-12-31T23:59"), "通常", 1)
+    index = EventIndex([inverted, normal])
+
+    assert index.active_at(parse_time("2025-12-26T00:00")) == [normal]
+    assert index.active_at(parse_time("2025-06-01T00:00")) == []
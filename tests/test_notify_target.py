@@ -0,0 +1,70 @@
+"""通知先ごとの送信 (一部の取得元が失敗した場合) のテスト
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+
+import send_discord_notification as bot  # noqa: E402
+from deadline import Deadline  # noqa: E402
+from event_model import Event, EventSchedule, parse_time  # noqa: E402
+from registry import Source, Target  # noqa: E402
+
+NOW = parse_time("2026-10-18T12:00")
+EVENT = Event(
+    "ピックアップ募集", parse_time("2026-10-15T11:00"), parse_time("2026-10-22T10:59"),
+    "ピックアップ募集 (2026/10/15 11:00 ~ 2026/10/22 10:59)",
+)
+
+
+class _Client:
+    """送信したメッセージを記録するだけのクライアント"""
+
+    def __init__(self):
+        self.payloads = []
+
+    def deliver(self, url, payloads, deadline):
+        self.payloads.extend(payloads)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = _Client()
+    monkeypatch.setattr(bot, "get_client", lambda: client)
+    return client
+
+
+def _results(*errors):
+    results = []
+    for index, error in enumerate(errors):
+        source = Source(f"source{index}", f"http://127.0.0.1/{index}")
+        if error is None:
+            results.append(bot.SourceResult(source, EventSchedule([EVENT])))
+        else:
+            results.append(bot.SourceResult(source, error=error))
+    return results
+
+
+def test_sends_events_from_succeeded_sources(client):
+    target = Target("main", "http://127.0.0.1/webhook", mode="full")
+
+    sent = bot.notify_target(target, _results(None, Exception("接続できません")), NOW, Deadline(10))
+
+    assert sent == len(client.payloads) == 1
+    header, note = client.payloads[0]["content"].split("\n")
+    assert header.startswith("📢 開催中のイベント情報")
+    assert note == "⚠️ 取得元 source1 の取得に失敗したため、そのイベントは含まれていません。"
+    assert EVENT.formatted in client.payloads[0]["embeds"][0]["description"]
+
+
+def test_all_sources_failed_is_an_error(client):
+    target = Target("main", "http://127.0.0.1/webhook", mode="full")
+
+    with pytest.raises(Exception, match="source0, source1"):
+        bot.notify_target(target, _results(Exception("a"), Exception("b")), NOW, Deadline(10))
+
+    assert client.payloads == []
@@ -0,0 +1,38 @@
+"""スナップショットの再解析 (tools/replay.py) のテスト
+
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "lambda"))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from replay import plan_jsonl, run_task  # noqa: E402
+
+PAGE = '<div id="body"><ul><li>イベント開催中 (2026/10/15 11:00 ～ 10/22 10:59)</li></ul></div>'
+
+
+def test_bad_lines_are_recorded_as_errors(tmp_path):
+    path = tmp_path / "archive.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"captured_at": "2026-10-16T09:00", "html": PAGE}),
+        '{"captured_at": "2026-10-17T09:00", "html": "<p>途中で切れた行',
+        json.dumps({"html": PAGE}),
+        json.dumps({"captured_at": "2026-10-18T09:00", "html": PAGE, "id": "last"}),
+    ]) + "\n", encoding="utf-8")
+
+    results = []
+    timeline = {}
+    for task in plan_jsonl(str(path), 2):
+        chunk_results, chunk_timeline = run_task(task)
+        results.extend(chunk_results)
+        timeline.update(chunk_timeline)
+
+    assert [record["id"] for record in results] == ["archive.jsonl:1", "archive.jsonl:2", "archive.jsonl:3", "last"]
+    assert ["error" in record for record in results] == [False, True, True, False]
+    assert results[2]["error"] == "captured_at がありません"
+    # 壊れた行があっても、前後の行は解析される
+    assert len(timeline) == 1
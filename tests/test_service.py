@@ -0,0 +1,73 @@
+"""常駐モード (取得と通知の間隔) のテスト
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+
+import service  # noqa: E402
+from registry import Registry, Source, Target  # noqa: E402
+from send_discord_notification import SourceResult  # noqa: E402
+
+SOURCE = Source("default", "http://127.0.0.1/")
+
+
+@pytest.fixture
+def refresher(monkeypatch):
+    registry = Registry([SOURCE], [
+        Target("diff", "http://127.0.0.1/diff", mode="diff"),
+        Target("full", "http://127.0.0.1/full", mode="full"),
+    ])
+    refresher = service.Refresher(registry, service.EventCache(), notify_interval=3600)
+    refresher.sent = []
+    refresher.failing = set()
+    refresher.fetch_error = None
+
+    def fetch_sources(sources, deadline, executor):
+        return {SOURCE.name: SourceResult(SOURCE, error=refresher.fetch_error)}
+
+    def notify_targets(registry, results, now, deadline, executor, targets=None):
+        refresher.sent.append([target.name for target in targets])
+        return {target.name: Exception("送信できません") for target in targets if target.name in refresher.failing}
+
+    monkeypatch.setattr(service, "fetch_sources", fetch_sources)
+    monkeypatch.setattr(service, "notify_targets", notify_targets)
+    yield refresher
+    refresher.stop()
+
+
+def test_full_targets_are_sent_once_per_notify_interval(refresher, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(service.time, "monotonic", lambda: clock[0])
+
+    for _ in range(3):
+        assert refresher.refresh()
+        clock[0] += 600
+    assert refresher.sent == [["diff", "full"], ["diff"], ["diff"]]
+
+    clock[0] = 1000.0 + 3600
+    refresher.refresh()
+    assert refresher.sent[-1] == ["diff", "full"]
+
+
+def test_delivery_failures_do_not_trigger_fetch_retry(refresher):
+    refresher.failing = {"full"}
+
+    # 取得に成功していれば、送信に失敗しても通常の間隔で次の取得を行う
+    assert refresher.refresh()
+    # 送信に失敗した全件通知の通知先には、次の取得の後に改めて送る
+    refresher.failing = set()
+    assert refresher.refresh()
+    assert refresher.sent == [["diff", "full"], ["diff", "full"]]
+    refresher.refresh()
+    assert refresher.sent[-1] == ["diff"]
+
+
+def test_fetch_failures_back_off(refresher):
+    refresher.fetch_error = Exception("接続できません")
+    assert not refresher.refresh()
+    assert refresher.next_delay(1) == pytest.approx(refresher.retry, rel=refresher.jitter)
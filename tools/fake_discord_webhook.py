@@ -0,0 +1,131 @@
+"""ローカルで動くDiscord Webhookの代替サーバー
+
+    python tools/fake_discord_webhook.py [--port 8000] [--limit 5] [--window 2]
+    WEBHOOK_URL=http://127.0.0.1:8000/webhook python lambda/send_discord_notification.py
+
+Discordと同じ制限値 (content 2000文字、embed 10個・合計6000文字) を検証し、
+window 秒あたり limit 件を超えると 429 と X-RateLimit-* ヘッダーを返す。
+受け取ったメッセージは標準出力に表示する。
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_LIMIT = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_TOTAL_LIMIT = 6000
+EMBEDS_PER_MESSAGE = 10
+
+
+def validate(payload):
+    """Discordの制限に違反していればエラーメッセージを返す"""
+    content = payload.get("content") or ""
+    embeds = payload.get("embeds") or []
+    if not content and not embeds:
+        return "Cannot send an empty message"
+    if len(content) > CONTENT_LIMIT:
+        return f"content must be {CONTENT_LIMIT} or fewer in length"
+    if len(embeds) > EMBEDS_PER_MESSAGE:
+        return f"embeds must be {EMBEDS_PER_MESSAGE} or fewer in length"
+    total = 0
+    for embed in embeds:
+        description = embed.get("description") or ""
+        if len(description) > EMBED_DESCRIPTION_LIMIT:
+            return f"embed description must be {EMBED_DESCRIPTION_LIMIT} or fewer in length"
+        total += len(description)
+    if total > EMBED_TOTAL_LIMIT:
+        return f"embed size exceeds maximum size of {EMBED_TOTAL_LIMIT}"
+    return None
+
+
+class FakeWebhookServer(ThreadingHTTPServer):
+    def __init__(self, address, limit, window, verbose=True):
+        super().__init__(address, FakeWebhookHandler)
+        self.limit = limit
+        self.window = window
+        self.verbose = verbose  # 受け取ったメッセージを標準出力に表示する
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.count = 0
+        self.messages = []
+
+    def take(self):
+        """(許可されたか, 残り回数, リセットまでの秒数) を返す"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.window:
+                self.window_start = now
+                self.count = 0
+            reset_after = self.window - (now - self.window_start)
+            if self.count >= self.limit:
+                return False, 0, reset_after
+            self.count += 1
+            return True, self.limit - self.count, reset_after
+
+
+class FakeWebhookHandler(BaseHTTPRequestHandler):
+    def _reply(self, status, body=None, headers=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if data:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._reply(400, {"message": "Invalid JSON", "code": 50109})
+            return
+
+        allowed, remaining, reset_after = self.server.take()
+        headers = {
+            "X-RateLimit-Bucket": "fake-webhook-bucket",
+            "X-RateLimit-Limit": str(self.server.limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if not allowed:
+            headers["Retry-After"] = f"{reset_after:.3f}"
+            self._reply(429, {"message": "You are being rate limited.",
+                              "retry_after": round(reset_after, 3), "global": False}, headers)
+            return
+
+        error = validate(payload)
+        if error:
+            self._reply(400, {"message": error, "code": 50035}, headers)
+            return
+
+        self.server.messages.append(payload)
+        if self.server.verbose:
+            print(json.dumps(payload, ensure_ascii=False), flush=True)
+        self._reply(204, headers=headers)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--limit", type=int, default=5, help="window 秒あたりの送信可能数")
+    parser.add_argument("--window", type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = FakeWebhookServer(("127.0.0.1", args.port), args.limit, args.window)
+    print(f"http://127.0.0.1:{args.port}/webhook で待ち受けています", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""保存済みのページのスナップショットをまとめて解析し、イベントの時系列を再構築する
+
+    python tools/replay.py SNAPSHOTS... --out timeline.jsonl [--results results.jsonl] [--compare old.jsonl]
+
+SNAPSHOTS には次のどちらかを指定する (複数指定可)。
+
+    ディレクトリ  *.html のスナップショット。取得日時は manifest.json (benchmarks/fixtures と同じ形式)
+                  の captured_at、なければファイルの更新日時を使う
+    JSONLファイル  1行に1件 {"captured_at": "...", "html": "...", "id": "...", "source": "..."}
+                  (id と source は省略可)
+
+スナップショットは数件ずつのチャンクに分けてプロセスプールで並列に解析し、終わったものから
+イベント名 (正規化済み) と開始日が同じイベントを1件にまとめていく。--out には
+開始日時順のイベントの一覧 (初めて/最後に見えた取得日時と出現回数つき) をJSONLで保存する。
+
+--results にはスナップショットごとの解析結果の要約 (件数とハッシュ) を保存する。
+解析ロジックを変更したときは、変更前の --results を --compare に渡すと、
+解析結果が変わったスナップショットを一覧にして終了コード1で終わる。
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+
+import html_backend  # noqa: E402
+from event_model import JST, Event, parse_time  # noqa: E402
+from event_state import event_key  # noqa: E402
+from send_discord_notification import parse_events  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# 1タスクで処理するスナップショット数
+DEFAULT_CHUNK_SIZE = 16
+
+
+def _captured_at(value):
+    return parse_time(value).isoformat()
+
+
+def plan_directory(directory, chunk_size):
+    """ディレクトリ内のスナップショットをチャンク (タスク) に分ける"""
+    captured = {}
+    manifest_path = os.path.join(directory, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            for entry in json.load(f).get("snapshots", []):
+                captured[entry["file"]] = (entry["captured_at"], entry.get("source"))
+
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".html"):
+            continue
+        path = os.path.join(directory, name)
+        captured_at, source = captured.get(name, (None, None))
+        if captured_at is None:
+            logger.warning(f"{name} の取得日時がマニフェストにないため、ファイルの更新日時を使います。")
+            captured_at = datetime.fromtimestamp(os.path.getmtime(path), JST).isoformat()
+        snapshots.append((path, name, captured_at, source))
+
+    return [
+        ("files", snapshots[start:start + chunk_size])
+        for start in range(0, len(snapshots), chunk_size)
+    ]
+
+
+def plan_jsonl(path, chunk_size):
+    """JSONLを chunk_size 行ずつのバイト範囲 (タスク) に分ける (本文は各ワーカーが読む)"""
+    tasks = []
+    with open(path, "rb") as f:
+        offset = f.tell()
+        count = 0
+        first_line = 1
+        line_no = 0
+        for line in iter(f.readline, b""):
+            line_no += 1
+            count += 1
+            if count == chunk_size:
+                tasks.append(("jsonl", path, offset, count, first_line))
+                offset = f.tell()
+                first_line = line_no + 1
+                count = 0
+        if count:
+            tasks.append(("jsonl", path, offset, count, first_line))
+    return tasks
+
+
+def _iter_task(task):
+    """タスクに含まれるスナップショットを (id, 読み込み関数) として返す。
+
+    読み込み関数は (id, 取得日時, 取得元, HTML) を返す。壊れた行や読めないファイルは
+    読み込み関数を呼んだときに例外になるので、スナップショットごとに失敗として記録できる。
+    """
+    if task[0] == "files":
+        for path, snapshot_id, captured_at, source in task[1]:
+            yield snapshot_id, partial(_read_file, path, snapshot_id, captured_at, source)
+        return
+
+    _, path, offset, count, first_line = task
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for index in range(count):
+            line = f.readline()
+            if not line.strip():
+                continue
+            snapshot_id = f"{os.path.basename(path)}:{first_line + index}"
+            yield snapshot_id, partial(_read_record, line, snapshot_id)
+
+
+def _read_file(path, snapshot_id, captured_at, source):
+    with open(path, "r", encoding="utf-8") as f:
+        return snapshot_id, captured_at, source, f.read()
+
+
+def _read_record(line, default_id):
+    """JSONLの1行を (id, 取得日時, 取得元, HTML) にする"""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("スナップショットはJSONオブジェクトではありません")
+    for field in ("captured_at", "html"):
+        if field not in record:
+            raise ValueError(f"{field} がありません")
+    return record.get("id") or default_id, record["captured_at"], record.get("source"), record["html"]
+
+
+def merge_event(timeline, key, record):
+    """同じイベントの記録を1件にまとめる (名前や終了日時は最後に見えたときのものを使う)"""
+    current = timeline.get(key)
+    if current is None:
+        timeline[key] = dict(record)
+        return
+    if record["last_seen"] > current["last_seen"]:
+        for field in ("name", "end", "formatted", "last_seen"):
+            current[field] = record[field]
+    current["first_seen"] = min(current["first_seen"], record["first_seen"])
+    current["sightings"] += record["sightings"]
+
+
+def replay_snapshot(snapshot_id, captured_at, source, html, timeline):
+    """スナップショット1件を解析し、timeline に追加して要約を返す"""
+    parsed = parse_events(html)
+    captured_at = _captured_at(captured_at)
+    at = parse_time(captured_at)
+    # 現在の通知と同じく、リスト項目から何も見つからない場合だけフォールバック候補を使う
+    candidates = parsed["items"] or parsed["fallback"]
+    active = 0
+    for order, candidate in enumerate(candidates):
+        event = Event.from_candidate(candidate, order)
+        active += event.is_active(at)
+        merge_event(timeline, event_key(event), {
+            "name": event.name,
+            "start": event.start.isoformat(),
+            "end": event.end.isoformat(),
+            "formatted": event.formatted,
+            "first_seen": captured_at,
+            "last_seen": captured_at,
+            "sightings": 1,
+        })
+
+    digest = hashlib.sha256(
+        json.dumps(parsed, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return {
+        "id": snapshot_id,
+        "captured_at": captured_at,
+        "source": source,
+        "items": len(parsed["items"]),
+        "fallback": len(parsed["fallback"]),
+        "active": active,
+        "sha256": digest,
+    }
+
+
+def run_task(task):
+    """ワーカープロセスで1チャンクを処理する"""
+    timeline = {}
+    results = []
+    for snapshot_id, read in _iter_task(task):
+        captured_at = None
+        try:
+            snapshot_id, captured_at, source, html = read()
+            results.append(replay_snapshot(snapshot_id, captured_at, source, html, timeline))
+        except Exception as e:
+            results.append({"id": snapshot_id, "captured_at": captured_at, "error": str(e)})
+    return results, timeline
+
+
+def _init_worker(backend):
+    # スナップショットごとのログは出さない (失敗は結果に記録する)
+    logging.disable(logging.WARNING)
+    html_backend.HTML_BACKEND = backend
+
+
+def write_jsonl(path, records):
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return {record["id"]: record for record in map(json.loads, f) if "sha256" in record}
+
+
+def compare_results(previous, current):
+    """(解析結果が変わったid, 新しく増えたid, なくなったid) を返す"""
+    changed = sorted(
+        snapshot_id for snapshot_id, record in current.items()
+        if snapshot_id in previous and previous[snapshot_id]["sha256"] != record.get("sha256")
+    )
+    added = sorted(set(current) - set(previous))
+    removed = sorted(set(previous) - set(current))
+    return changed, added, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("snapshots", nargs="+", help="スナップショットのディレクトリまたはJSONLファイル")
+    parser.add_argument("--out", required=True, help="イベントの時系列 (JSONL) の保存先")
+    parser.add_argument("--results", help="スナップショットごとの解析結果の要約 (JSONL) の保存先")
+    parser.add_argument("--compare", help="以前の --results と比べて、解析結果が変わったスナップショットを表示する")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="ワーカープロセス数")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="1タスクで処理するスナップショット数")
+    parser.add_argument("--backend", default=html_backend.HTML_BACKEND, help="HTMLパーサー (auto / selectolax / lxml / html.parser)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    backend = html_backend.resolve_backend(args.backend)
+
+    tasks = []
+    for path in args.snapshots:
+        if os.path.isdir(path):
+            tasks.extend(plan_directory(path, args.chunk_size))
+        else:
+            tasks.extend(plan_jsonl(path, args.chunk_size))
+    logger.info(f"{len(tasks)} 個のチャンクを {args.workers} プロセスで解析します (HTMLパーサー: {backend})")
+
+    timeline = {}
+    results = {}
+    errors = 0
+    results_file = open(f"{args.results}.tmp", "w", encoding="utf-8") if args.results else None
+    finished = False
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(backend,)) as executor:
+            futures = [executor.submit(run_task, task) for task in tasks]
+            # 終わったチャンクから順に時系列へまとめ、要約を書き出す
+            for done, future in enumerate(as_completed(futures), 1):
+                chunk_results, chunk_timeline = future.result()
+                for key, record in chunk_timeline.items():
+                    merge_event(timeline, key, record)
+                for record in chunk_results:
+                    if "error" in record:
+                        errors += 1
+                        logger.warning(f"{record['id']} の解析に失敗しました: {record['error']}")
+                    results[record["id"]] = record
+                    if results_file:
+                        results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                logger.info(f"{done}/{len(tasks)} チャンク完了 ({len(results)} 件、イベント {len(timeline)} 件)")
+        finished = True
+    finally:
+        if results_file:
+            results_file.close()
+            # 途中で止まった場合は、書きかけの要約を残さない
+            if not finished:
+                os.remove(results_file.name)
+    if args.results:
+        os.replace(f"{args.results}.tmp", args.results)
+
+    write_jsonl(args.out, (
+        dict(key=key, **record)
+        for key, record in sorted(timeline.items(), key=lambda item: (item[1]["start"], item[0]))
+    ))
+    logger.info(f"{len(results)} 件のスナップショットから {len(timeline)} 件のイベントを {args.out} に保存しました"
+                f" (失敗 {errors} 件)")
+
+    if args.compare:
+        changed, added, removed = compare_results(load_results(args.compare), results)
+        for snapshot_id in changed:
+            print(f"解析結果が変わりました: {snapshot_id}")
+        print(f"変化 {len(changed)} 件 / 追加 {len(added)} 件 / 削除 {len(removed)} 件")
+        if changed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()